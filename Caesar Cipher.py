@@ -1,4 +1,324 @@
+import collections
+import itertools
+import marshal
+import math
+import os
+import re
 import string
+import sys
+import time
+
+
+# Optional instrumentation: while a hook is set with set_instrumentation(), the main functions report how long each call
+# took, along with counters such as bytes processed and dictionary lookups. With no hook set (the default), each of them
+# only checks a global variable once per call.
+
+_hook = None
+
+
+def set_instrumentation(hook):
+    '''
+    Sets the function that receives timing reports, or turns reporting off with None. The hook is called as
+    hook(phase, seconds, counters) at the end of each call of an instrumented function, where phase is the name of the
+    function (e.g. 'get_words' or 'decode_story'), seconds is the wall time the call took (including any instrumented calls
+    it made), and counters is a dict of numbers such as 'bytes', 'words' and 'lookups'.
+
+    Input:
+        - hook (callable or None): the hook, such as an Instrumentation object
+    Output:
+        - (callable or None): the hook that was set before, so it can be restored
+
+    Example usage:
+    >>> stats = Instrumentation()
+    >>> previous = set_instrumentation(stats)
+    >>> CipherMsg('Mjqqt, Btwqi!').decrypt_msg(load_words())
+    'Hello, World!'
+    >>> set_instrumentation(previous)
+    >>> stats.as_dict()['score_shifts']['lookups']
+    2
+    '''
+    global _hook
+    previous = _hook
+    _hook = hook
+    return previous
+
+
+def _report(phase, start, **counters):
+    '''
+    Sends the time since start and the counters to the hook, if one is still set.
+    '''
+    hook = _hook
+    if hook is not None:
+        hook(phase, time.perf_counter() - start, counters)
+
+
+class Instrumentation(object):
+    '''
+    A hook for set_instrumentation() which adds up the number of calls, the wall time, and the counters of each phase.
+
+    Example Usage:
+    >>> stats = Instrumentation()
+    >>> set_instrumentation(stats)
+    >>> decode_story('EncodedCoverLetter.txt', 'DecodedCoverLetter.txt')
+    >>> set_instrumentation(None)
+    >>> print(stats.to_json())
+    '''
+
+    def __init__(self):
+        '''
+        Initializes an Instrumentation object with no phases recorded.
+        '''
+        self.phases = {}
+
+    def __repr__(self):
+        return f'Instrumentation({self.phases})'
+
+    def __call__(self, phase, seconds, counters):
+        '''
+        Adds one call of the phase to the totals.
+        '''
+        totals = self.phases.get(phase)
+        if totals is None:
+            totals = self.phases[phase] = {'calls': 0, 'seconds': 0.0}
+        totals['calls'] += 1
+        totals['seconds'] += seconds
+        for name, value in counters.items():
+            totals[name] = totals.get(name, 0) + value
+
+    def as_dict(self):
+        '''
+        Output:
+            - (dict): maps each phase to a dict of its 'calls', 'seconds' and summed counters
+        '''
+        return {phase: dict(totals) for phase, totals in self.phases.items()}
+
+    def to_json(self, indent=2):
+        '''
+        Output:
+            - (string): the totals of every phase as JSON
+        '''
+        import json                                          # imported here so the command line starts faster
+        return json.dumps(self.phases, indent=indent, sort_keys=True)
+
+    def reset(self):
+        '''
+        Forgets all recorded phases.
+        '''
+        self.phases = {}
+
+
+# Optional result cache: while a ResultCache is set with set_result_cache(), CipherMsg.decrypt_msg() reuses the results of
+# earlier calls on the same text instead of recomputing them.
+
+_result_cache = None
+
+
+def set_result_cache(cache):
+    '''
+    Sets the cache used by decrypt_msg(), or stops caching with None.
+
+    Input:
+        - cache (ResultCache or None): the cache to use
+    Output:
+        - (ResultCache or None): the cache that was set before, so it can be restored
+    '''
+    global _result_cache
+    previous = _result_cache
+    _result_cache = cache
+    return previous
+
+
+def text_digest(text):
+    '''
+    Gives a short hash of the text, used to identify it in a ResultCache.
+
+    Input:
+        - text (string): any text
+    Output:
+        - (bytes): 16 byte BLAKE2b hash of the text
+    '''
+    import hashlib
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+def _write_atomically(file_name, data):
+    '''
+    Writes data (bytes) to a temporary file and then renames it to file_name, so that readers never see half a file.
+    Raises OSError if the file can't be written.
+    '''
+    temp_file = f'{file_name}.{os.getpid()}.tmp'
+    try:
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+        os.replace(temp_file, file_name)
+    except OSError:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+        raise
+
+
+class ResultCache(object):
+    '''
+    A least-recently-used cache of decryption results, keyed by a hash of the message text. It holds entries up
+    to a total size of max_bytes (mostly the length of the cached texts), dropping the least recently used ones first, and
+    can be saved to a file so that it survives restarts.
+
+    Decryptions are cached by the text, the method (and confidence threshold of the adaptive method) and the list of valid
+    words used, so one cache can be shared by callers using different word lists.
+
+    Example Usage:
+    >>> cache = ResultCache(max_bytes=1 << 20, file_name='results.cache')
+    >>> set_result_cache(cache)
+    >>> CipherMsg('Mjqqt, Btwqi!').decrypt_msg(load_words())     # computed
+    'Hello, World!'
+    >>> CipherMsg('Mjqqt, Btwqi!').decrypt_msg(load_words())     # from the cache
+    'Hello, World!'
+    >>> cache.stats()['hits']
+    1
+    >>> cache.save()
+    '''
+
+    CACHE_VERSION = 2
+    ENTRY_OVERHEAD = 256        # rough number of bytes an entry takes besides its text
+
+    def __init__(self, max_bytes=64 << 20, file_name=None):
+        '''
+        Initializes a ResultCache object, loading any entries saved in file_name.
+
+        Inputs:
+            - max_bytes (int): the most bytes the cached entries may take
+            - file_name (string): file to load entries from and save them to (None to keep them in memory only)
+        '''
+        self.max_bytes = max_bytes
+        self.file_name = file_name
+        self.entries = collections.OrderedDict()    # key -> (value, size), from least to most recently used
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if file_name is not None:
+            self._load()
+
+    def __repr__(self):
+        return f'ResultCache({len(self.entries)} entries, {self.size} of {self.max_bytes} bytes)'
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        '''
+        Looks up a result, marking it as the most recently used.
+
+        Input:
+            - key (tuple): the key the result was stored under
+        Output:
+            - the cached value, or None if it isn't in the cache
+        '''
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, size):
+        '''
+        Stores a result, dropping least recently used results until everything fits in max_bytes.
+
+        Inputs:
+            - key (tuple): the key to store the result under
+            - value: the result (anything marshal can save)
+            - size (int): roughly how many bytes the result takes
+        '''
+        size += self.ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return                                  # would push out everything else
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= old[1]
+        self.entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            self.size -= self.entries.popitem(last=False)[1][1]
+            self.evictions += 1
+
+    def stats(self):
+        '''
+        Output:
+            - (dict): the number of 'hits', 'misses', 'evictions' and 'entries', and the 'bytes' in use
+        '''
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self.entries),
+                'bytes': self.size}
+
+    def clear(self):
+        '''
+        Removes every entry (the statistics are kept).
+        '''
+        self.entries.clear()
+        self.size = 0
+
+    def save(self, file_name=None):
+        '''
+        Saves the entries, in least to most recently used order, to file_name (defaults to the file given when the cache
+        was created).
+        '''
+        file_name = file_name or self.file_name
+        if file_name is None:
+            raise ValueError('No file name to save the cache to')
+        _write_atomically(file_name, marshal.dumps((self.CACHE_VERSION, list(self.entries.items()))))
+
+    def _load(self):
+        '''
+        Loads saved entries from self.file_name, ignoring a missing or unreadable file.
+        '''
+        try:
+            with open(self.file_name, 'rb') as f:
+                version, entries = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return
+        if version != self.CACHE_VERSION:
+            return
+        for key, (value, size) in entries:
+            self.put(key, value, size - self.ENTRY_OVERHEAD)
+
+
+def _shifted_alphabet(shift):
+    '''
+    Gives the lower- and uppercase alphabets shifted by the given amount, wrapping around past 'z'.
+    '''
+    shift %= 26
+    return (string.ascii_lowercase[shift:] + string.ascii_lowercase[:shift] +
+            string.ascii_uppercase[shift:] + string.ascii_uppercase[:shift])
+
+
+_SHIFT_TABLES = [str.maketrans(string.ascii_letters, _shifted_alphabet(shift)) for shift in range(26)]
+_BYTES_SHIFT_TABLES = [bytes.maketrans(string.ascii_letters.encode(), _shifted_alphabet(shift).encode()) for shift in range(26)]
+
+
+def shift_text(text, shift):
+    '''
+    Shifts every letter of the text by the given amount, keeping its case and leaving all other characters as they are. Uses
+    translation tables built once for all 26 shifts, so the whole text is shifted in a single pass.
+
+    Inputs:
+        - text (string or bytes): the text to shift (bytes are treated as ASCII)
+        - shift (int): the amount by which to shift every letter
+    Output:
+        - (string or bytes, the same type as text): the shifted text
+
+    Example usage:
+    >>> shift_text('Hello, World!', 5)
+    'Mjqqt, Btwqi!'
+    >>> shift_text(b'Hello, World!', 5)
+    b'Mjqqt, Btwqi!'
+    '''
+    if isinstance(text, str):
+        return text.translate(_SHIFT_TABLES[shift % 26])
+    return text.translate(_BYTES_SHIFT_TABLES[shift % 26])
+
 
 class Message(object):
     '''
@@ -58,11 +378,7 @@ class Message(object):
         Output:
             - (dict): maps every letter (string) to another letter (string)
         '''
-        alphabet_lower = string.ascii_lowercase     # list of lowercase letters (doubled for wrap-around shifts beyond z)
-        alphabet_upper = string.ascii_uppercase     # list of uppercase letters (doubled for wrap-around shifts beyond Z)
-        alphabet_dict = {letter:alphabet_lower[(n+shift)%26] for n, letter in enumerate(string.ascii_lowercase)}        # dictionary assigning each lowercase letter to its corresponding shifted letter
-        alphabet_dict.update({letter:alphabet_upper[(n+shift)%26] for n, letter in enumerate(string.ascii_uppercase)})  # updated with dictionary assigning each uppercase letter to its corresponding shifted letter
-        return alphabet_dict
+        return dict(zip(string.ascii_letters, _shifted_alphabet(shift)))    # pairs each letter with its shifted letter
 
     def apply_shift(self, shift):
         '''
@@ -76,14 +392,11 @@ class Message(object):
             - (string): The message text with all letters shifted by the
                 desired amount.
         '''
-        dict_shifted = Message.build_shift_dict(self.text,shift)  # call function to create shifted dictionary
-        cipher = ''                                               # define an empty string in which to place the encoded message
-        for i in range(len(self.text)):
-            if self.text[i] in dict_shifted:                      # if the given character is a letter, add its corresponding 
-                cipher += str(dict_shifted[self.text[i]])         #     shifted letter to the empty string
-            else:
-                cipher += str(self.text[i])                       # if the given character is not a letter (i.e. punctuation),
-        return cipher                                             #     add it to the encoded message string as is
+        start = _hook is not None and time.perf_counter()
+        cipher = shift_text(self.text, shift)                     # letters are shifted using the prebuilt translation table,
+        if start:                                                 #     punctuation is left as is
+            _report('apply_shift', start, bytes=len(self.text))
+        return cipher
 
 
 
@@ -157,25 +470,279 @@ class PlainMsg(Message):
 
 # Functions to accompany CipherMsg
 
-def load_words():
+def word_pattern(word):
+    '''
+    Gives the shift pattern of a lowercase word: the word shifted so that it starts with 'a'. Every Caesar shift of a word has
+    the same pattern, so two words with the same pattern are always some shift of one another.
+
+    Input:
+        - word (string): a non-empty lowercase word made up only of letters
+    Output:
+        - (string): the word shifted to start with 'a'
+
+    Example usage:
+    >>> word_pattern('hello')
+    'axeeh'
+    >>> word_pattern('ifmmp')
+    'axeeh'
+    '''
+    return word.translate(_SHIFT_TABLES[(97 - ord(word[0])) % 26])     # shifts the first letter back to 'a'
+
+
+class WordIndex(object):
+    '''
+    A hashed, read-only set of valid lowercase words used to score decryption attempts. Membership checks are constant time,
+    unlike searching through the plain list of words.
+
+    The index also groups the words by their shift pattern (see word_pattern()), so that a single lookup of an encrypted word
+    gives every shift under which it decrypts to a valid word. The pattern index is only built the first time it is needed,
+    and is saved to a compact cache file next to the word file so later runs skip rebuilding it.
+
+    Example Usage:
+    >>> index = WordIndex.from_file('words.txt')
+    >>> 'identity' in index
+    True
+    >>> 'tloia' in index
+    False
+    '''
+
+    CACHE_VERSION = 2
+
+    def __init__(self, words):
+        '''
+        Initializes a WordIndex object.
+
+        Input:
+            - words (iterable of strings): the valid words (converted to lowercase)
+        '''
+        self.words = frozenset(map(str.lower, words))
+        self._patterns = None
+        self._pattern_blob = None       # marshalled pattern index read from the cache file, loaded on first use
+        self._cache = None              # (cache_file, stat, digest) to save the pattern index to once it is built
+        self._digest = None
+
+    def __repr__(self):
+        '''
+        Textual representation of the object giving the number of words it holds.
+        '''
+        return f'WordIndex({len(self.words)} words)'
+
+    def __contains__(self, word):
+        return word in self.words
+
+    def __len__(self):
+        return len(self.words)
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def digest(self):
+        '''
+        Gives a short hash of the words in the index, computed once, which identifies the word list in a ResultCache. An
+        index loaded with from_file() uses the hash of the word file instead, which is known without hashing the words.
+
+        Output:
+            - (bytes): 16 byte BLAKE2b hash of the sorted words, or the first 16 bytes of the SHA-256 hash of the word file
+        '''
+        if self._digest is None:
+            self._digest = text_digest('\n'.join(sorted(self.words)))
+        return self._digest
+
+    @property
+    def patterns(self):
+        '''
+        The pattern index: a dict from each shift pattern to a string of the first letters of the words with that pattern.
+        It is read from the cache file if there was a valid one, and otherwise built from the words and then saved.
+        '''
+        if self._patterns is None:
+            if self._pattern_blob is not None:
+                keys, letters = marshal.loads(self._pattern_blob)
+                self._patterns = dict(zip(keys.split('\n'), letters.split('\n'))) if keys else {}
+                self._pattern_blob = None
+            else:
+                by_letter = {}
+                for word in self.words:
+                    if word.isascii() and word.isalpha():                    # only letters can come out of iter_words()
+                        by_letter.setdefault(word[0], []).append(word)
+                patterns = {}
+                for letter, words in by_letter.items():                     # one translate() per first letter, not per word
+                    shifted = '\n'.join(words).translate(_SHIFT_TABLES[(97 - ord(letter)) % 26])
+                    for key in shifted.split('\n'):
+                        patterns[key] = patterns.get(key, '') + letter
+                self._patterns = patterns
+                if self._cache is not None:
+                    self._write_cache(*self._cache, marshal.dumps(('\n'.join(patterns), '\n'.join(patterns.values()))))
+            self._cache = None
+        return self._patterns
+
+    def valid_shifts(self, word):
+        '''
+        Finds every shift which turns the given (encrypted) word into a valid word, using one lookup in the pattern index.
+
+        Input:
+            - word (string): a word made up only of letters
+        Output:
+            - (list of integers): the shifts (0-25) that make the word valid, in no particular order
+        '''
+        word = word.lower()
+        first = ord(word[0]) - 97
+        return [(ord(letter) - 97 - first) % 26 for letter in self.patterns.get(word_pattern(word), '')]
+
+    @classmethod
+    def from_file(cls, file_name='words.txt', cache_file=None):
+        '''
+        Builds a WordIndex from a space separated word file. The words are always read from the file itself (this is faster
+        than unpacking them from a cache), while the pattern index comes from the cache file when it is still valid. The
+        cache is valid if it was written for a word file with the same modification time and size, or failing that, the
+        same SHA-256 hash. Otherwise the pattern index is rebuilt when first needed and the cache is rewritten.
+
+        Inputs:
+            - file_name (string): name of the word file to read in
+            - cache_file (string): name of the cache file (defaults to file_name + '.cache')
+        Output:
+            - (WordIndex): index of all the words in the file
+        '''
+        if cache_file is None:
+            cache_file = file_name + '.cache'
+        with open(file_name, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            data = f.read()
+        index = cls(data.decode().split())
+        cached = cls._read_cache(cache_file)
+        if cached is not None and cached[1:3] == (stat.st_mtime_ns, stat.st_size):   # unchanged file, skip hashing it
+            index._pattern_blob = cached[4]
+            index._digest = bytes.fromhex(cached[3])[:16]
+            return index
+
+        import hashlib                                                            # imported here so the command line starts faster
+        digest = hashlib.sha256(data).hexdigest()
+        if cached is not None and cached[3] == digest:                            # file was touched but not changed
+            index._pattern_blob = cached[4]
+            index._write_cache(cache_file, stat, digest, cached[4])
+        else:
+            index._cache = (cache_file, stat, digest)
+        index._digest = bytes.fromhex(digest)[:16]
+        return index
+
+    @classmethod
+    def file_digest(cls, file_name='words.txt', cache_file=None):
+        '''
+        Gives the digest() of the WordIndex that from_file() would build, without building it. The hash of the word file is
+        taken from the cache file when it is still valid, so usually the word file isn't even read.
+
+        Inputs:
+            - file_name (string): name of the word file
+            - cache_file (string): name of the cache file (defaults to file_name + '.cache')
+        Output:
+            - (bytes): the first 16 bytes of the SHA-256 hash of the word file
+        '''
+        if cache_file is None:
+            cache_file = file_name + '.cache'
+        stat = os.stat(file_name)
+        cached = cls._read_cache(cache_file)
+        if cached is not None and cached[1:3] == (stat.st_mtime_ns, stat.st_size):
+            return bytes.fromhex(cached[3])[:16]
+        import hashlib
+        with open(file_name, 'rb') as f:
+            return hashlib.sha256(f.read()).digest()[:16]
+
+    @classmethod
+    def _read_cache(cls, cache_file):
+        '''
+        Reads a cache file, returning None if it is missing, unreadable, or written by a different cache version.
+        '''
+        try:
+            with open(cache_file, 'rb') as f:
+                cached = marshal.loads(f.read())                                  # much faster than marshal.load(f) on large files
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(cached, tuple) or len(cached) != 5 or cached[0] != cls.CACHE_VERSION:
+            return None
+        return cached
+
+    def _write_cache(self, cache_file, stat, digest, pattern_blob):
+        '''
+        Saves the marshalled pattern index to the cache file. Failing to write the cache (e.g. a read-only directory) is not
+        an error.
+        '''
+        try:
+            _write_atomically(cache_file, marshal.dumps((self.CACHE_VERSION, stat.st_mtime_ns, stat.st_size, digest,
+                                                         pattern_blob)))
+        except OSError:
+            pass
+
+
+def load_words(source='words.txt'):
     '''
     A function to import a dictionary of valid words with which to compare decrypted words.
 
+    Input:
+        - source (string, WordIndex or list of strings): name of the word file to read in, or an already loaded WordIndex
+            which is returned as is (a list of words is converted into a WordIndex)
     Outputs:
-        - (list of strings): list of lowercase valid words
+        - (WordIndex): hashed set of lowercase valid words
+    '''
+    if isinstance(source, WordIndex):
+        return source
+    start = _hook is not None and time.perf_counter()
+    index = WordIndex.from_file(source) if isinstance(source, str) else WordIndex(source)
+    if start:
+        _report('load_words', start, words=len(index))
+    return index
+
+
+def _word_list_digest(source):
+    '''
+    Gives the digest() of load_words(source), without loading the words when source is the name of a word file.
+    '''
+    if isinstance(source, str):
+        return WordIndex.file_digest(source)
+    return load_words(source).digest()
+
+
+_NOT_LETTER_OR_SPACE = re.compile(r'[^A-Za-z\s]+')     # everything removed from words: punctuation, digits, other letters
+
+
+def iter_words(source, lower=True):
     '''
+    Yields the individual words of a text one at a time, removing all punctuation (and anything else that isn't an ASCII
+    letter) from each, in a single pass. The text can be given as one string or as an iterable of chunks of it (e.g. a file
+    opened in text mode, or blocks read from one), so long documents never have to be held or split up all at once. Words
+    are allowed to continue from one chunk into the next.
+
+    Inputs:
+        - source (string or iterable of strings): the text, or the chunks of the text in order
+        - lower (bool): if True, the words are converted to lowercase
+    Output:
+        - (generator of strings): the words without punctuation; parts of the text with no letters (e.g. ' - ') give no word
 
-    f = open('words.txt', 'r')                                           # open text file containing word dictionary
-    wordlist = []                                                        # initialize an empty list to which to append the words
-    for line in f:                                                       # splits the letters between a space into a string,
-        wordlist.extend([word.lower() for word in line.split(' ')])      #     converts all letters to lowercase, and adds all
-    f.close()                                                            #     words to the empty list
-    return wordlist                                                      # closes the file and returns the list of word strings
+    Example usage:
+    >>> list(iter_words("Hello! How are you today, ma'am?"))
+    ['hello', 'how', 'are', 'you', 'today', 'maam']
+    >>> list(iter_words(['Hel', 'lo, Wor', 'ld!']))
+    ['hello', 'world']
+    '''
+    if isinstance(source, str):
+        source = (source,)
+    carry = ''                                              # the start of a word that may continue in the next chunk
+    for chunk in source:
+        if not chunk:
+            continue
+        cleaned = carry + _NOT_LETTER_OR_SPACE.sub('', chunk)
+        if lower:
+            cleaned = cleaned.lower()
+        words = cleaned.split()
+        carry = ''
+        if words and not chunk[-1].isspace() and not cleaned[-1].isspace():
+            carry = words.pop()
+        yield from words
+    if carry:
+        yield carry
 
 
 def get_words(phrase):
     '''
-    Splits a phrase or sentence up into a list of individual words, removing all punctation.
+    Splits a phrase or sentence up into a list of individual words, removing all punctation (see iter_words()).
 
     Input:
         - phrase (string): The string to be broken up into words
@@ -186,15 +753,11 @@ def get_words(phrase):
     >>> print(get_words("Hello! How are you today, ma'am?"))
     ['Hello', 'How', 'are', 'you', 'today', 'maam']
     '''
-    alphabet = list(string.ascii_lowercase) + list(string.ascii_uppercase)      # creates a list including both upper- and lowercase letters  
-    phrase_list = []                                                            # initializes empty list to which to append striped words
-    for i in phrase.split():                                                    # splits phrase into individual words
-        character_list = list(i)                                                # converts word string into list of individual characters
-        for n in range(len(character_list)):                                    # loops through all individual characters
-            if i[n] not in alphabet:                                            # if statement to check if the character is a letter
-                character_list.remove(i[n])                                     # if not a letter (puncuation), it is removed
-        phrase_list.append(''.join(character_list))                             # appends the words stripped of punctuation to the empty list
-    return phrase_list                                                          # returns the list of strings (words without punctuation)
+    start = _hook is not None and time.perf_counter()
+    phrase_list = list(iter_words(phrase, lower=False))
+    if start:
+        _report('get_words', start, bytes=len(phrase), words=len(phrase_list))
+    return phrase_list
 
 
 def count_valid_words(potential_words, list_valid_words):
@@ -203,10 +766,10 @@ def count_valid_words(potential_words, list_valid_words):
     words are real words. Ensures that the capitalization of all words matches.
 
     Inputs:
-        - potential_words (list of strings): list of the individual
-            words to check if they are real words
-        - list_valid_words (list of strings): list of valid words
-            read in from the 'words.txt' file 
+        - potential_words (iterable of strings): the individual
+            words to check if they are real words (e.g. from iter_words())
+        - list_valid_words (WordIndex or list of strings): valid words
+            read in from the 'words.txt' file
                 - use (load_words())
     Output:
         - (integer): the number of words in potential_words which
@@ -216,16 +779,129 @@ def count_valid_words(potential_words, list_valid_words):
     >>> print(count_valid_words(['merkle', 'identity', 'tloia', 'decentralized'], valid_words))
     2
     '''
+    start = _hook is not None and time.perf_counter()
+    if not isinstance(list_valid_words, (WordIndex, set, frozenset)):
+        list_valid_words = set(list_valid_words)       # a plain list would be searched one entry at a time for every word
     counter = 0                                        # initializes counter at 0
+    total = 0
     for word in potential_words:                       # loops through list of potential words from input
+        total += 1
         if word.lower() in list_valid_words:           # searches for lowercase-converted word in list of valid words
             counter += 1                               # if the potential word matches an entry in the list of valid words, increases counter by 1
+    if start:
+        _report('count_valid_words', start, words=total, lookups=total)
     return counter                                     # after checking all potential words, returns the sum total of the valid words
 
 
 
+def score_shifts(potential_words, valid_words):
+    '''
+    Scores all 26 shifts in a single pass over the words: for every shift, counts how many of the potential words would be
+    valid words after applying that shift. Gives the same scores as calling apply_shift(), get_words() and count_valid_words()
+    for each shift, but looks up each distinct word only once.
+
+    Inputs:
+        - potential_words (iterable of strings): the encrypted words, without punctuation (use iter_words())
+        - valid_words (WordIndex): the index of valid words (use load_words())
+    Output:
+        - (list of integers): 26 scores, where the score at index i is the number of valid words after shifting by i
+
+    Example usage:
+    >>> scores = score_shifts(['Ifmmp', 'xpsme'], load_words())
+    >>> scores.index(max(scores))
+    25
+    '''
+    start = _hook is not None and time.perf_counter()
+    score = [0] * 26
+    counts = {}
+    for word, count in collections.Counter(potential_words).items():   # counts repeated words so each is only looked up once
+        if word:
+            word = word.lower()
+            counts[word] = counts.get(word, 0) + count
+    for word, count in counts.items():
+        for shift in valid_words.valid_shifts(word):
+            score[shift] += count
+    if start:
+        _report('score_shifts', start, words=sum(counts.values()), lookups=len(counts))
+    return score
+
+
+def shift_confidence(scores):
+    '''
+    Gives how sure we can be that the shift with the highest score is the right one, from how far ahead it is of the
+    second-best shift. If the two shifts were really equally good, every word valid under just one of them would be as likely
+    to count for either, so the lead of the best shift is compared to what chance alone would give (using the normal
+    approximation of a sign test).
+
+    Input:
+        - scores (list of integers): the 26 scores of the shifts (use score_shifts())
+    Output:
+        - (float): between 0 and 1, where 0.5 means the two best shifts are tied and values near 1 mean a clear winner; 0 if
+            no shift gives any valid words
+
+    Example usage:
+    >>> shift_confidence(score_shifts(['Ifmmp', 'xpsme'], load_words()))
+    0.9213503964748574
+    '''
+    best, second = sorted(scores, reverse=True)[:2]
+    if best == 0:
+        return 0.0
+    z = (best - second) / math.sqrt(best + second)          # the lead in standard deviations of a fair coin
+    return 0.5 * (1 + math.erf(z / math.sqrt(2)))
+
+
+ENGLISH_LETTER_FREQUENCIES = [8.167, 1.492, 2.782, 4.253, 12.702, 2.228, 2.015, 6.094, 6.966, 0.153, 0.772, 4.025, 2.406,
+                              6.749, 7.507, 1.929, 0.095, 5.987, 6.327, 9.056, 2.758, 0.978, 2.360, 0.150, 1.974, 0.074]   # percent, a to z
+
+
+def letter_histogram(text):
+    '''
+    Counts how many times each letter appears in the text, ignoring case and all other characters.
+
+    Input:
+        - text (string): the text to count letters in
+    Output:
+        - (list of integers): 26 counts, from 'a' to 'z'
+
+    Example usage:
+    >>> letter_histogram('Abba!')[:3]
+    [2, 2, 0]
+    '''
+    start = _hook is not None and time.perf_counter()
+    counts = collections.Counter(text)                             # one counting pass over the text
+    histogram = [counts[lower] + counts[upper] for lower, upper in zip(string.ascii_lowercase, string.ascii_uppercase)]
+    if start:
+        _report('letter_histogram', start, bytes=len(text))
+    return histogram
+
+
+def chi_squared_shifts(histogram):
+    '''
+    Compares the letter frequencies after each of the 26 shifts to the frequencies of letters in English, using the
+    chi-squared statistic. The lower the value, the more the shifted letters look like English.
+
+    Input:
+        - histogram (list of integers): 26 letter counts of the encrypted text (use letter_histogram())
+    Output:
+        - (list of floats): 26 chi-squared values, where the value at index i is for the text shifted by i
+    '''
+    total = sum(histogram)
+    if total == 0:
+        return [0.0] * 26                                          # no letters, every shift is as good as any other
+    expected = [total * freq / 100 for freq in ENGLISH_LETTER_FREQUENCIES]
+    chi_squared = []
+    for shift in range(26):                                        # after shifting by shift, letter n came from letter n - shift
+        chi_squared.append(sum((histogram[(n - shift) % 26] - expected[n]) ** 2 / expected[n] for n in range(26)))
+    return chi_squared
+
+
 
 
+class DecryptionError(ValueError):
+    '''
+    Raised when a message could not be decrypted, i.e. no shift other than 0 turns it into valid words.
+    '''
+
 
 class CipherMsg(Message):
     '''
@@ -244,11 +920,15 @@ class CipherMsg(Message):
         Input:
             - text (string): The messages encrypted text
 
-        A CipherMsg object inherits from Message and has 4 attributes:
+        A CipherMsg object inherits from Message and has 6 attributes:
             - self.message_text (string, determined from input)
             - self.is_decrypted (bool, initially False)
             - self.best_shift (integer, initially None)
             - self.decoded_msg (string, initially None)
+            - self.scores (list of 26 numbers, initially None): the score of every shift from the last decryption, either
+                the number of valid words or the chi-squared value, depending on the method used
+            - self.confidence (float, initially None): how sure the last decryption is of best_shift (see
+                shift_confidence()), or None after decrypting by frequency
         '''
         Message.__init__(self,text)
         self.text = text
@@ -256,92 +936,1009 @@ class CipherMsg(Message):
         self.is_decrypted = False
         self.best_shift = None
         self.decoded_msg = None
+        self.scores = None
+        self.confidence = None
+
 
+    FREQUENCY_TIE_MARGIN = 0.25       # shifts within this fraction of the best chi-squared value are settled using valid words
+    ADAPTIVE_CONFIDENCE = 0.999       # decrypt_adaptive() stops once it is this sure of the best shift
+    ADAPTIVE_SAMPLE_WORDS = 64        # words scored by decrypt_adaptive() before it first checks its confidence
 
-    def decrypt_msg(self, valid_words):
+    def decrypt_msg(self, valid_words='words.txt', method='words', raise_error=False):
         '''
         Decryptes self.message_text by trying every possible shift value and finding the "best" one, where "best" here is the shift
         value that results in the greatest number of valid words found in the resulting decrypted message. If multiple shifts are
-        equally "best", then any can be set as the decoded message.
+        equally "best", then any can be set as the decoded message. All 26 shifts are scored in one pass over the words of the
+        message (see score_shifts()).
 
-        Updates the attributes of self.is_decrypted, self.best_shift, and self.decoded_msg after finding the best shift and decoding the message. 
+        With method='frequency' the "best" shift is instead the one whose letter frequencies are closest to English (lowest
+        chi-squared value), which only needs one counting pass over the text and no word list. Valid words are only used to
+        choose between shifts whose chi-squared values are within FREQUENCY_TIE_MARGIN of the best, which mostly happens for
+        short messages.
 
-        Input:
-            - valid_words (list of string): the list of valid English words to compare potential messages to.
+        With method='adaptive' only as many words as needed are scored, starting from the beginning of the message, until
+        the best shift is clear (see decrypt_adaptive()), so long messages take about as long to crack as short ones. A
+        message which can't be decrypted always raises DecryptionError with this method.
+
+        Updates the attributes of self.is_decrypted, self.best_shift, self.scores, self.confidence and self.decoded_msg after finding the best shift and decoding the message. 
+
+        Inputs:
+            - valid_words (WordIndex, list of strings or file name): the valid English words to compare potential messages to.
+            - method (string): 'words' to count valid words, 'frequency' to compare letter frequencies, or 'adaptive' to
+                count valid words in as much of the message as needed
+            - raise_error (bool): if True, a message which can't be decrypted raises DecryptionError instead of printing
+                'Message could not be decrypted.' and returning None
         Output:
             - (string): the decoded message string
+        Raises:
+            - DecryptionError: if the message can't be decrypted, with raise_error=True or method='adaptive'
         '''
-        dictionary = load_words()                                           # loads in dictionary
-        score = []                                                          # initializes empty list in which to append the 'score': the number of valid words resulting from each shift
-        for i in range(26):                                                 # loops through all possible shifts (26)
-            shifted_msg = Message.apply_shift(self, i)                      # uses apply_shift method to shift phrase by fixed integer given by i (between 0 and 26)
-            shifted_msg_list = get_words(shifted_msg)                       # creates list of strings without punctuation of shifted phrase
-            num = count_valid_words(shifted_msg_list, dictionary)           # counts the number of valid words in this shift
-            score.append(num)                                               # appends the number of valid words for this shift to empty list
-            
-        self.best_shift = score.index(max(score))                           # identifies the shift value (given by the index) of the highest score
-        if self.best_shift == 0:
-            print('Message could not be decrypted.')
+        start = _hook is not None and time.perf_counter()
+        cache = _result_cache
+        cached = None
+        if cache is not None:
+            threshold = self.ADAPTIVE_CONFIDENCE if method == 'adaptive' else None
+            words_digest = None if method == 'frequency' else _word_list_digest(valid_words)   # 'frequency' rarely needs words
+            key = ('decrypt', method, threshold, words_digest, text_digest(self.text))
+            cached = cache.get(key)
+        if cached is not None:
+            self.best_shift, scores, decoded = cached                       # decrypted this exact text before
+            self.scores = list(scores)                                      # a copy, so changing it can't change the cache
+        else:
+            tie_broken = False
+            if method == 'words':
+                dictionary = load_words(valid_words)                        # uses the given dictionary (loads words.txt if given a file name)
+                self.scores = score_shifts(iter_words(self.text), dictionary)  # the 'score' of each shift: the number of valid words it results in
+                self.best_shift = self.scores.index(max(self.scores))       # identifies the shift value (given by the index) of the highest score
+            elif method == 'frequency':
+                self.best_shift, tie_broken = self._best_frequency_shift(valid_words)
+            elif method == 'adaptive':
+                self.decrypt_adaptive(valid_words)                          # raises DecryptionError if it can't be decrypted
+            else:
+                raise ValueError(f"Unknown method {method!r}, expected 'words', 'frequency' or 'adaptive'")
+            decoded = None if self.best_shift == 0 else Message.apply_shift(self, self.best_shift)   # applies the shift of the highest score
+            if cache is not None and not tie_broken:                        # the word list that broke the tie isn't in the key
+                cache.put(key, (self.best_shift, tuple(self.scores), decoded), len(self.text))
+        self.confidence = None if method == 'frequency' else shift_confidence(self.scores)
+
+        if decoded is None:
+            if raise_error or method == 'adaptive':
+                raise DecryptionError('Message could not be decrypted.')
+            print('Message could not be decrypted.', file=sys.stderr)
         else:
-            self.decoded_msg =  Message.apply_shift(self, self.best_shift)      # applies the shift of the highest score
+            self.decoded_msg = decoded
             self.is_decrypted = True                                            # changes is_decrypted switch to True!
-            return self.decoded_msg                                             # returns the decoded message
+        if start:
+            _report('decrypt_msg', start, bytes=len(self.text))
+        return decoded                                                          # returns the decoded message
 
+    def decrypt_adaptive(self, valid_words='words.txt', confidence=None, chunk_size=4096):
+        '''
+        Finds the best shift by counting valid words like decrypt_msg(), but only in as much of the message as it takes to be
+        sure of the answer. The first ADAPTIVE_SAMPLE_WORDS words are scored, then twice as many more each time, until the
+        confidence in the best shift (see shift_confidence()) reaches the threshold or the message runs out. A few hundred
+        words are nearly always enough, so the time taken hardly depends on the length of the message.
 
+        Updates self.best_shift, self.scores (for the words scored) and self.confidence, but doesn't decode the message: use
+        apply_shift(best_shift), or decrypt_msg(method='adaptive') to do both.
 
+        Inputs:
+            - valid_words (WordIndex, list of strings or file name): the valid English words to compare potential messages to.
+            - confidence (float): stop once this sure of the best shift (defaults to ADAPTIVE_CONFIDENCE)
+            - chunk_size (int): number of characters split into words at a time
+        Output:
+            - (tuple): the best shift (int) and the confidence in it (float between 0 and 1), which is below the threshold
+                only if the whole message was scored without reaching it
+        Raises:
+            - DecryptionError: if no shift other than 0 gives any valid words
+
+        Example usage:
+        >>> CipherMsg(read_story('EncodedCoverLetter.txt')).decrypt_adaptive(load_words())
+        (17, 0.9999999997596855)
+        '''
+        start = _hook is not None and time.perf_counter()
+        threshold = self.ADAPTIVE_CONFIDENCE if confidence is None else confidence
+        dictionary = load_words(valid_words)
+        chunks = (self.text[n:n + chunk_size] for n in range(0, len(self.text), chunk_size))   # never splits the whole text at once
+        words = iter_words(chunks)
+        scores = [0] * 26
+        scored = 0
+        batch_size = self.ADAPTIVE_SAMPLE_WORDS
+        while True:
+            batch = list(itertools.islice(words, batch_size))
+            scored += len(batch)
+            for shift, score in enumerate(score_shifts(batch, dictionary)):
+                scores[shift] += score
+            self.confidence = shift_confidence(scores)
+            if self.confidence >= threshold or len(batch) < batch_size:    # sure enough, or no words left
+                break
+            batch_size = scored                                             # doubles the sample
+        self.scores = scores
+        self.best_shift = scores.index(max(scores))                         # the lowest shift wins ties, as in decrypt_msg()
+        if start:
+            _report('decrypt_adaptive', start, words=scored)
+        if self.best_shift == 0:
+            raise DecryptionError('Message could not be decrypted.')
+        return self.best_shift, self.confidence
 
-def read_story(file_name):
-    '''
-    Reads in the file_name and outputs a string. Takes multiline files and stitches them back together in a single string with line-breaks
-    embedded in the string.
+    def _best_frequency_shift(self, valid_words):
+        '''
+        Finds the shift with the lowest chi-squared value, using valid words to break near ties (see decrypt_msg()). Gives
+        the shift, and whether valid words were needed to choose it.
+        '''
+        chi_squared = self.scores = chi_squared_shifts(letter_histogram(self.text))
+        ranked = sorted(range(26), key=lambda shift: chi_squared[shift])
+        best = chi_squared[ranked[0]]
+        close = [shift for shift in ranked if chi_squared[shift] <= best * (1 + self.FREQUENCY_TIE_MARGIN)]
+        if len(close) == 1:
+            return close[0], False
+        score = score_shifts(iter_words(self.text), load_words(valid_words))
+        return max(close, key=lambda shift: score[shift]), True             # max() keeps the lowest chi-squared shift on equal scores
 
-    Input:
-        - file_name (string): Name of file to read in
-    Output:
-        - (string): single string of entire file
-    '''
-    f = open(file_name, 'r')                                   # reads in the file
-    lines = f.readlines()                                      # splits the text into separate lines
-    f.close()                                                  # closes file
-    return ''.join(lines)                                      # returns all items joined together in a string
 
 
-def encode_story(plaintext_file, new_file_name, shift):
+
+# Compact messages for holding very many messages in memory at once
+
+def _pack_text(text):
     '''
-    Reads in a text file, shifts each letter by a given shift value, and saves the encoded message to a text file.
+    Stores text as ASCII bytes (one byte per character, without the header of a str) when it is plain ASCII, and as it is
+    otherwise.
+    '''
+    return text.encode('ascii') if text.isascii() else text
+
+
+def _unpack_text(data):
+    '''
+    Gives back the string stored by _pack_text().
+    '''
+    return data.decode('ascii') if isinstance(data, bytes) else data
+
+
+class CompactMessage(object):
+    '''
+    A memory-lean version of Message for keeping millions of messages in memory. It has no per-object __dict__, keeps
+    ASCII text as bytes, and shares the module-wide shift tables, so that every message costs little more than its text.
+    It has the same methods as Message.
+
+    Example Usage:
+    >>> msg = CompactMessage('Happy Birthday!')
+    >>> msg.apply_shift(1)
+    'Ibqqz Cjsuiebz!'
+    '''
+
+    __slots__ = ('_data',)
+
+    def __init__(self, text):
+        '''
+        Initializes an object of type CompactMessage.
+
+        Inputs:
+            - text (string): the text of the message (can include punctuation)
+        '''
+        self._data = _pack_text(text)
+
+    def __repr__(self):
+        return self.text
+
+    @property
+    def text(self):
+        return _unpack_text(self._data)
+
+    message_text = text
+
+    def get_message_text(self):
+        '''
+        Used to safely access the text of the message outside of the class.
+
+        Outputs:
+            - (string): the text of the message
+        '''
+        return _unpack_text(self._data)
+
+    def change_message_text(self, new_text):
+        '''
+        Setter method to safely update and change the text of a message.
+
+        Input:
+            - new_text (string): new text to change the message to
+        '''
+        self._data = _pack_text(new_text)
+
+    build_shift_dict = Message.build_shift_dict
+
+    def apply_shift(self, shift):
+        '''
+        Gives the text of the message with all letters shifted by the given amount (see Message.apply_shift()).
+        '''
+        return _unpack_text(shift_text(self._data, shift))                  # bytes are shifted without decoding them first
+
+
+class CompactPlainMsg(CompactMessage):
+    '''
+    A memory-lean version of PlainMsg, with the same methods. Only the text and the shift are stored: the encrypted message
+    and the shift dictionary are worked out each time they are asked for.
+
+    Example Usage:
+    >>> msg = CompactPlainMsg('Hello, World!', 5)
+    >>> print(msg.get_encrypted_msg())
+    # 'Mjqqt, Btwqi!'
+    '''
+
+    __slots__ = ('shift',)
+
+    def __init__(self, text, shift):
+        '''
+        Initializes a CompactPlainMsg object.
+
+        Inputs:
+            - text (string): the plain message text
+            - shift (int): the amount the encrypted message to to be shifted
+        '''
+        CompactMessage.__init__(self, text)
+        self.shift = shift
+
+    @property
+    def shift_dict(self):
+        return self.build_shift_dict(self.shift)
+
+    @property
+    def encrypted_msg(self):
+        return self.apply_shift(self.shift)
+
+    def get_shift(self):
+        '''
+        Safely access the self.shift attribute outside the class.
+
+        Outputs:
+            - (integer): the value of self.shift
+        '''
+        return self.shift
+
+    def change_shift(self, new_shift):
+        '''
+        Changes the shift used to encrypt the message.
+
+        Input:
+            - new_shift (integer): new value to shift all the letters by
+        '''
+        self.shift = new_shift
+
+    def get_encrypted_msg(self):
+        '''
+        Encrypts the message with the current shift.
+
+        Outputs:
+            - (string): the encrypted message
+        '''
+        return self.apply_shift(self.shift)
+
+
+class CompactCipherMsg(CompactMessage):
+    '''
+    A memory-lean version of CipherMsg, with the same methods and attributes except scores. Only the text, the best shift and
+    the confidence in it are stored: the decoded message is worked out each time it is asked for, and the scores of the
+    shifts are not kept.
+
+    Example Usage:
+    >>> cipher_example = CompactCipherMsg('Mjqqt, Btwqi!')
+    >>> print(cipher_example.decrypt_msg(load_words()))
+    Hello, World!
+    '''
+
+    __slots__ = ('best_shift', 'confidence')
+
+    def __init__(self, text):
+        '''
+        Initializes a CompactCipherMsg object.
+
+        Input:
+            - text (string): The messages encrypted text
+        '''
+        CompactMessage.__init__(self, text)
+        self.best_shift = None
+        self.confidence = None
+
+    @property
+    def is_decrypted(self):
+        return bool(self.best_shift)                                        # a best shift of 0 means it couldn't be decrypted
+
+    @property
+    def decoded_msg(self):
+        return self.apply_shift(self.best_shift) if self.best_shift else None
+
+    def decrypt_msg(self, valid_words='words.txt', method='words', raise_error=False):
+        '''
+        Finds the best shift of the message in the same way as CipherMsg.decrypt_msg(), keeping only the shift and the
+        confidence in it.
+
+        Inputs:
+            - valid_words (WordIndex, list of strings or file name): the valid English words to compare potential messages to.
+            - method (string): 'words', 'frequency' or 'adaptive' (see CipherMsg.decrypt_msg())
+            - raise_error (bool): if True, a message which can't be decrypted raises DecryptionError instead of returning None
+        Output:
+            - (string): the decoded message string (None if it couldn't be decrypted)
+        Raises:
+            - DecryptionError: if the message can't be decrypted, with raise_error=True or method='adaptive'
+        '''
+        cipher = CipherMsg(self.text)
+        try:
+            return cipher.decrypt_msg(valid_words, method, raise_error)
+        finally:
+            self.best_shift, self.confidence = cipher.best_shift, cipher.confidence
+
+    def decrypt_adaptive(self, valid_words='words.txt', confidence=None):
+        '''
+        Finds the best shift from as much of the message as needed, in the same way as CipherMsg.decrypt_adaptive().
+
+        Inputs:
+            - valid_words (WordIndex, list of strings or file name): the valid English words to compare potential messages to.
+            - confidence (float): stop once this sure of the best shift (defaults to CipherMsg.ADAPTIVE_CONFIDENCE)
+        Output:
+            - (tuple): the best shift (int) and the confidence in it (float between 0 and 1)
+        Raises:
+            - DecryptionError: if no shift other than 0 gives any valid words
+        '''
+        cipher = CipherMsg(self.text)
+        try:
+            return cipher.decrypt_adaptive(valid_words, confidence)
+        finally:
+            self.best_shift, self.confidence = cipher.best_shift, cipher.confidence
+
+
+def message_memory(messages):
+    '''
+    Measures how much memory a list of messages takes up, counting each message object, its attributes and everything they
+    refer to (the strings, bytes and dictionaries it holds, but not the classes or shared shift tables). Objects shared
+    between messages are counted once.
+
+    Input:
+        - messages (list of Message, CompactMessage or subclasses): the messages to measure
+    Output:
+        - (float): the average number of bytes per message
+    '''
+    seen = set()
+    total = 0
+    pending = list(messages)
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            pending.extend(obj)
+        elif isinstance(obj, (Message, CompactMessage)):
+            if hasattr(obj, '__dict__'):
+                pending.append(obj.__dict__)
+            for cls in type(obj).__mro__:
+                pending.extend(getattr(obj, name) for name in getattr(cls, '__slots__', ()) if hasattr(obj, name))
+    return total / max(len(messages), 1)
+
+
+
+
+# Batch functions for working on many messages at once (these need NumPy)
+
+def _pack_texts(texts):
+    '''
+    Packs a list of strings into one NumPy uint8 buffer of their UTF-8 bytes. Returns the buffer, the length of each text in
+    bytes, and the offset at which each text starts.
+    '''
+    import numpy as np
+    encoded = [text.encode() for text in texts]
+    lengths = np.fromiter((len(text) for text in encoded), dtype=np.int64, count=len(encoded))
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), lengths, offsets
+
+
+def _unpack_texts(buffer, offsets):
+    '''
+    Splits a uint8 buffer back into a list of strings at the given offsets (the reverse of _pack_texts()).
+    '''
+    data = buffer.tobytes()
+    return [data[start:end].decode() for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def encrypt_batch(texts, shifts):
+    '''
+    Shifts many messages at once. All messages are packed into a single byte buffer and the shift is applied to every letter
+    with vectorized NumPy arithmetic, giving the same results as Message(text).apply_shift(shift) for each message.
+
+    Inputs:
+        - texts (list of strings): the messages to shift
+        - shifts (int or list of ints): one shift for all messages, or one shift per message
+    Output:
+        - (list of strings): the shifted messages, in the same order
+
+    Example usage:
+    >>> encrypt_batch(['Hello, World!', 'Happy Birthday!'], [5, 1])
+    ['Mjqqt, Btwqi!', 'Ibqqz Cjsuiebz!']
+    '''
+    import numpy as np
+    if not texts:
+        return []
+    buffer, lengths, offsets = _pack_texts(texts)
+    shifts = np.broadcast_to(np.asarray(shifts, dtype=np.int64) % 26, (len(texts),))
+    byte_shifts = np.repeat(shifts.astype(np.uint8), lengths)     # the shift of the message each byte belongs to
+    shifted = buffer.copy()
+    for first in (ord('a'), ord('A')):
+        letters = (buffer >= first) & (buffer < first + 26)
+        shifted[letters] = (buffer[letters] - first + byte_shifts[letters]) % 26 + first
+    return _unpack_texts(shifted, offsets)
+
+
+def _letter_mask(buffer):
+    '''
+    Gives a NumPy mask of which bytes of a uint8 buffer are ASCII letters.
+    '''
+    return ((buffer >= ord('a')) & (buffer <= ord('z'))) | ((buffer >= ord('A')) & (buffer <= ord('Z')))
+
+
+def letter_histograms(texts):
+    '''
+    Counts the letters of many messages at once (see letter_histogram()).
+
+    Input:
+        - texts (list of strings): the messages to count letters in
+    Output:
+        - (NumPy array of ints, shape (len(texts), 26)): the letter counts of each message, from 'a' to 'z'
+    '''
+    import numpy as np
+    buffer, lengths, offsets = _pack_texts(texts)
+    is_letter = _letter_mask(buffer)
+    letter = (buffer | 0x20) - ord('a')                            # setting the 0x20 bit makes uppercase letters lowercase
+    message = np.repeat(np.arange(len(texts)), lengths)
+    bins = message[is_letter] * 26 + letter[is_letter]
+    return np.bincount(bins, minlength=len(texts) * 26).reshape(len(texts), 26)
+
+
+def crack_batch(texts, valid_words='words.txt', method='frequency'):
+    '''
+    Decrypts many messages at once, giving the same best shifts and decoded messages as CipherMsg(text).decrypt_msg() for
+    each message.
+
+    With method='frequency', the letter histograms and the chi-squared values of all 26 shifts are computed for every message
+    together with NumPy. Only messages whose best shifts are too close to call use valid words, one message at a time. With
+    method='words', each message is scored with score_shifts() (valid words are needed then).
+
+    Inputs:
+        - texts (list of strings): the encrypted messages
+        - valid_words (WordIndex, list of strings or file name): the valid English words to compare potential messages to
+        - method (string): 'frequency' or 'words' (see CipherMsg.decrypt_msg())
+    Output:
+        - (tuple): a NumPy array of the best shift of each message, and a list of the decoded messages (None for a message
+            which could not be decrypted, as with decrypt_msg())
+    '''
+    import numpy as np
+    if method == 'words':
+        dictionary = load_words(valid_words)
+        best_shifts = np.zeros(len(texts), dtype=np.int64)
+        for n, text in enumerate(texts):
+            score = score_shifts(iter_words(text), dictionary)
+            best_shifts[n] = score.index(max(score))
+    elif method == 'frequency':
+        best_shifts = _best_frequency_shifts(texts, valid_words)
+    else:
+        raise ValueError(f"Unknown method {method!r}, expected 'words' or 'frequency'")
+    decoded = encrypt_batch(texts, best_shifts) if texts else []
+    return best_shifts, [text if shift else None for text, shift in zip(decoded, best_shifts.tolist())]
+
+
+def _chi_squared_table(histograms):
+    '''
+    Computes chi_squared_shifts() of many letter histograms at once, giving a NumPy array of shape (len(histograms), 26).
+    '''
+    import numpy as np
+    histograms = np.asarray(histograms, dtype=np.float64)
+    frequencies = np.array(ENGLISH_LETTER_FREQUENCIES) / 100
+    expected = histograms.sum(axis=1)[:, None, None] * frequencies    # shape (messages, 1, 26)
+    source = (np.arange(26)[None, :] - np.arange(26)[:, None]) % 26   # source[shift, n]: the letter that becomes n after shift
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.nan_to_num(((histograms[:, source] - expected) ** 2 / expected).sum(axis=2))
+
+
+def _close_shifts(chi_squared):
+    '''
+    Marks the shifts whose chi-squared values are within CipherMsg.FREQUENCY_TIE_MARGIN of the lowest value of their row,
+    giving a NumPy mask of the same shape as chi_squared (one row of 26 values per message or column).
+    '''
+    margin = 1 + CipherMsg.FREQUENCY_TIE_MARGIN + 1e-9                  # a little extra so rounding never hides a close shift
+    return chi_squared <= chi_squared.min(axis=1, keepdims=True) * margin
+
+
+def _best_frequency_shifts(texts, valid_words):
+    '''
+    Finds the lowest chi-squared shift of every message (see CipherMsg._best_frequency_shift()).
+    '''
+    import numpy as np
+    chi_squared = _chi_squared_table(letter_histograms(texts))
+    best_shifts = chi_squared.argmin(axis=1)
+    for n in np.flatnonzero(_close_shifts(chi_squared).sum(axis=1) > 1):
+        best_shifts[n] = CipherMsg(texts[n])._best_frequency_shift(valid_words)[0]   # close calls are settled exactly as decrypt_msg() would
+    return best_shifts
+
+
+
+
+# Vigenère ciphers, cracked by splitting them into Caesar ciphers (these need NumPy)
+
+def _letter_codes(text):
+    '''
+    Gives the letters of a text, in order and without anything else, as a NumPy array of numbers from 0 ('a') to 25 ('z').
+    '''
+    import numpy as np
+    buffer = np.frombuffer(text.encode(), dtype=np.uint8)
+    return (buffer[_letter_mask(buffer)] | 0x20) - ord('a')           # setting the 0x20 bit makes uppercase letters lowercase
+
+
+def _shifts_to_key(shifts):
+    '''
+    Gives the Vigenère key whose letters undo the given decryption shifts of the columns.
+    '''
+    return ''.join(chr(ord('a') + (-shift) % 26) for shift in shifts)
+
+
+def vigenere_shift(text, key, decrypt=False):
+    '''
+    Encrypts (or decrypts) a text with the Vigenère cipher: the n-th letter of the text is shifted by the n-th letter of the
+    key ('a' = 0, 'b' = 1, ...), starting again from the beginning of the key once it runs out. Letters keep their case, and
+    all other characters are left as they are and don't use up a letter of the key.
+
+    Inputs:
+        - text (string): the text to shift
+        - key (string): the key, made up only of letters
+        - decrypt (bool): if True, shifts every letter back instead, undoing the encryption
+    Output:
+        - (string): the shifted text
+
+    Example usage:
+    >>> vigenere_shift('Attack at dawn!', 'lemon')
+    'Lxfopv ef rnhr!'
+    >>> vigenere_shift('Lxfopv ef rnhr!', 'lemon', decrypt=True)
+    'Attack at dawn!'
+    '''
+    import numpy as np
+    key_shifts = np.frombuffer(key.lower().encode(), dtype=np.uint8) - ord('a')
+    if not len(key_shifts) or key_shifts.max() >= 26:
+        raise ValueError(f'The key must be made up of letters only, not {key!r}')
+    if decrypt:
+        key_shifts = (26 - key_shifts) % 26
+    buffer = np.frombuffer(text.encode(), dtype=np.uint8)
+    is_letter = _letter_mask(buffer)
+    letters = buffer[is_letter]
+    letter_shifts = np.tile(key_shifts, -(-len(letters) // len(key_shifts)))[:len(letters)]   # the key letter of each letter
+    shifted = buffer.copy()
+    shifted[is_letter] = ((letters | 0x20) - ord('a') + letter_shifts) % 26 + ord('A') + (letters & 0x20)  # 0x20 is set in lowercase
+    return shifted.tobytes().decode()
+
+
+def _column_histograms(codes, key_length):
+    '''
+    Counts the letters of each column of a text (every key_length-th letter, starting from each of the first key_length
+    letters), giving a NumPy array of shape (key_length, 26).
+    '''
+    import numpy as np
+    return np.array([np.bincount(codes[column::key_length], minlength=26) for column in range(key_length)]).reshape(-1, 26)
+
+
+def key_length_coincidence(text, max_key_length=20):
+    '''
+    Scores every possible key length of a Vigenère cipher using the index of coincidence: the chance that two letters picked
+    from the same column of the text (every key_length-th letter) are the same. Each column of the right key length is a
+    Caesar cipher, so it keeps the uneven letter frequencies of English (about 0.067), while with a wrong key length the
+    columns mix letters shifted by different amounts and look random (about 0.038). Every column is counted with one
+    vectorized NumPy call.
+
+    Inputs:
+        - text (string): the encrypted text
+        - max_key_length (int): the longest key length to score
+    Output:
+        - (NumPy array of floats): the average index of coincidence of the columns, where the value at index i is for a key
+            length of i + 1
+    '''
+    import numpy as np
+    codes = _letter_codes(text)
+    coincidence = np.zeros(max_key_length)
+    for key_length in range(1, max_key_length + 1):
+        counts = _column_histograms(codes, key_length)
+        sizes = counts.sum(axis=1)
+        pairs = np.maximum(sizes * (sizes - 1), 1)                      # number of ways to pick two letters of each column
+        coincidence[key_length - 1] = ((counts * (counts - 1)).sum(axis=1) / pairs).mean()
+    return coincidence
+
+
+def estimate_key_length(text, max_key_length=20):
+    '''
+    Estimates the length of the key of a Vigenère cipher (see key_length_coincidence()). Multiples of the key length score
+    as well as the key length itself, so the shortest key length within KEY_LENGTH_MARGIN of the best score is chosen.
+
+    Inputs:
+        - text (string): the encrypted text
+        - max_key_length (int): the longest key length to consider (limited to a quarter of the number of letters, so every
+            column has a few letters in it)
+    Output:
+        - (int): the most likely key length
+    '''
+    max_key_length = max(1, min(max_key_length, len(_letter_codes(text)) // 4))
+    coincidence = key_length_coincidence(text, max_key_length)
+    return int((coincidence >= coincidence.max() * (1 - KEY_LENGTH_MARGIN)).argmax()) + 1
+
+
+KEY_LENGTH_MARGIN = 0.1       # key lengths scoring within this fraction of the best are treated as equally likely
+
+
+class VigenereMsg(Message):
+    '''
+    This subclass focuses on decrypting Vigenère ciphers without knowing the key. The length of the key is estimated from
+    letter frequencies (see estimate_key_length()), after which every column of letters encrypted with the same letter of
+    the key is a Caesar cipher, and all the columns are solved together as a batch, in the same way as crack_batch(). This
+    takes time linear in the length of the key, instead of trying every one of the 26 ** key_length keys.
+
+    Example Usage:
+    >>> cipher_example = VigenereMsg(vigenere_shift(shift_text(read_story('EncodedCoverLetter.txt'), 17), 'lemon'))
+    >>> cipher_example.decrypt_msg(load_words())[:26]
+    'Dear Frances Donegan-Ryan,'
+    >>> cipher_example.get_key()
+    'lemon'
+    '''
+
+    def __init__(self, text):
+        '''
+        Initializes a VigenereMsg object.
+
+        Input:
+            - text (string): The messages encrypted text
+
+        A VigenereMsg object inherits from Message and has 4 attributes:
+            - self.message_text (string, determined from input)
+            - self.is_decrypted (bool, initially False)
+            - self.key (string, initially None)
+            - self.decoded_msg (string, initially None)
+        '''
+        Message.__init__(self, text)
+        self.message_text = text
+        self.is_decrypted = False
+        self.key = None
+        self.decoded_msg = None
+
+    ANALYSIS_SIZE = 1 << 17   # characters of the message used to find the key, which are plenty for its letter frequencies
+    SAMPLE_SIZE = 4096        # characters of the message used to choose between close shifts of a column using valid words
+
+    def get_key(self):
+        '''
+        Safely access the self.key attribute outside the class.
+
+        Outputs:
+            - (string): the key found by decrypt_msg(), or None before decrypting
+        '''
+        return self.key
+
+    def decrypt_msg(self, valid_words='words.txt', max_key_length=20, key_length=None):
+        '''
+        Finds the key of the message from its first ANALYSIS_SIZE characters and decrypts it. Each column is solved like
+        CipherMsg.decrypt_msg(method='frequency'): the shift whose letter frequencies are closest to English wins, and if
+        other shifts of a column come within CipherMsg.FREQUENCY_TIE_MARGIN of it, the one giving the most valid words in
+        the first SAMPLE_SIZE characters is chosen instead. A key which repeats itself (e.g. 'lemonlemon') is shortened.
+
+        Updates the attributes self.key, self.is_decrypted and self.decoded_msg.
+
+        Inputs:
+            - valid_words (WordIndex, list of strings or file name): the valid English words used to settle close calls, or
+                None to only use letter frequencies
+            - max_key_length (int): the longest key to look for
+            - key_length (int): the length of the key if it is known (it is estimated otherwise)
+        Output:
+            - (string): the decoded message string
+        Raises:
+            - DecryptionError: if the message has no letters, or the best key doesn't change it (a key of only 'a's)
+        '''
+        start = _hook is not None and time.perf_counter()
+        sample = self.text[:self.ANALYSIS_SIZE]
+        codes = _letter_codes(sample)
+        if not len(codes):
+            raise DecryptionError('Message could not be decrypted.')
+        if key_length is None:
+            key_length = estimate_key_length(sample, max_key_length)
+        chi_squared = _chi_squared_table(_column_histograms(codes, key_length))
+        shifts = chi_squared.argmin(axis=1)                                 # the shift which decrypts each column
+        if valid_words is not None:
+            shifts = self._settle_close_shifts(shifts, chi_squared, load_words(valid_words))
+
+        key = _shifts_to_key(shifts.tolist())
+        for length in range(1, key_length):                                 # shortens a key that repeats itself
+            if key_length % length == 0 and key == key[:length] * (key_length // length):
+                key = key[:length]
+                break
+        if start:
+            _report('vigenere_decrypt_msg', start, bytes=len(self.text), key_length=key_length)
+        if key.strip('a') == '':
+            raise DecryptionError('Message could not be decrypted.')
+        self.key = key
+        self.decoded_msg = vigenere_shift(self.text, key, decrypt=True)
+        self.is_decrypted = True
+        return self.decoded_msg
+
+    def _settle_close_shifts(self, shifts, chi_squared, dictionary):
+        '''
+        Chooses between the close shifts of each column by the number of valid words they give (see decrypt_msg()).
+        '''
+        shifts = shifts.copy()
+        sample = self.text[:self.SAMPLE_SIZE]
+        is_close = _close_shifts(chi_squared)
+        for column in range(len(shifts)):
+            close = [shift for shift in chi_squared[column].argsort().tolist() if is_close[column, shift]]
+            if len(close) == 1:
+                continue
+            scores = []
+            for shift in close:
+                shifts[column] = shift
+                key = _shifts_to_key(shifts.tolist())
+                scores.append(count_valid_words(iter_words(vigenere_shift(sample, key, decrypt=True)), dictionary))
+            shifts[column] = close[scores.index(max(scores))]               # the lowest chi-squared shift wins equal scores
+        return shifts
+
+
+
+
+def read_story(file_name):
+    '''
+    Reads in the file_name and outputs a string. Takes multiline files and stitches them back together in a single string with line-breaks
+    embedded in the string.
+
+    Input:
+        - file_name (string): Name of file to read in
+    Output:
+        - (string): single string of entire file
+    '''
+    start = _hook is not None and time.perf_counter()
+    f = open(file_name, 'r')                                   # reads in the file
+    lines = f.readlines()                                      # splits the text into separate lines
+    f.close()                                                  # closes file
+    story = ''.join(lines)                                     # all items joined together in a string
+    if start:
+        _report('read_story', start, bytes=len(story))
+    return story
+
+
+STREAM_CHUNK_SIZE = 1 << 20         # bytes read and written at a time when streaming files
+STREAM_SAMPLE_SIZE = 1 << 16        # bytes from the start of a file used to find the shift when streaming
+
+
+def shift_stream(source, new_file, shift, chunk_size=STREAM_CHUNK_SIZE):
+    '''
+    Shifts every letter read from one binary file object and writes the result to another, a chunk at a time.
+
+    Inputs:
+        - source (binary file object): where to read from (e.g. an open file or sys.stdin.buffer)
+        - new_file (binary file object): where to write to
+        - shift (int): the amount by which to shift every letter
+        - chunk_size (int): number of bytes to read at a time
+    Outputs:
+        - Nothing
+    '''
+    start = _hook is not None and time.perf_counter()
+    total = 0
+    chunk = source.read(chunk_size)
+    while chunk:
+        new_file.write(shift_text(chunk, shift))
+        total += len(chunk)
+        chunk = source.read(chunk_size)
+    if start:
+        _report('shift_stream', start, bytes=total)
+
+
+def shift_file(source_file, new_file_name, shift, chunk_size=STREAM_CHUNK_SIZE):
+    '''
+    Shifts every letter of a file by the given shift value, reading and writing it in fixed-size chunks so that memory use
+    stays the same however large the file is. The file is treated as bytes, so any non-ASCII characters are left as is.
+
+    Inputs:
+        - source_file (string): name of the file to read in
+        - new_file_name (string): name of the new file to be created
+        - shift (int): the amount by which to shift every letter
+        - chunk_size (int): number of bytes to read at a time
+    Outputs:
+        - Nothing (saves the shifted file)
+    '''
+    with open(source_file, 'rb') as source, open(new_file_name, 'wb') as new_file:
+        shift_stream(source, new_file, shift, chunk_size)
+
+
+def _sample_text(sample, complete):
+    '''
+    Turns the bytes read from the start of a file into a string, dropping the last word if the file continues past it.
+    '''
+    if not complete:
+        sample = sample.rsplit(None, 1)[0] if sample.strip() else b''   # the last word may continue past the sample
+    return sample.decode(errors='ignore')
+
+
+def read_sample(file_name, sample_size=STREAM_SAMPLE_SIZE):
+    '''
+    Reads up to sample_size bytes from the start of a file as a string, dropping a word that was cut off at the end.
+
+    Inputs:
+        - file_name (string): name of the file to read from
+        - sample_size (int): the most bytes to read
+    Output:
+        - (string): the start of the file
+    '''
+    with open(file_name, 'rb') as f:
+        sample = f.read(sample_size)
+    return _sample_text(sample, len(sample) < sample_size)
+
+
+def crack_stream(source, new_file, valid_words='words.txt', method='words', sample_size=STREAM_SAMPLE_SIZE,
+                 chunk_size=STREAM_CHUNK_SIZE):
+    '''
+    Decodes a binary stream of any length without knowing the shift: the shift is found from the first sample_size bytes,
+    and then the whole stream is decoded a chunk at a time. Works on streams that can't be read twice, such as stdin.
+
+    Inputs:
+        - source (binary file object): where to read the encrypted text from
+        - new_file (binary file object): where to write the decoded text to
+        - valid_words (WordIndex, list of strings or file name): the valid English words (see CipherMsg.decrypt_msg())
+        - method (string): 'words', 'frequency' or 'adaptive' (see CipherMsg.decrypt_msg())
+        - sample_size (int): number of bytes used to find the shift
+        - chunk_size (int): number of bytes to read at a time after the sample
+    Output:
+        - (CipherMsg): the sample used to find the shift, with its best_shift and scores
+    Raises:
+        - DecryptionError: if the sample could not be decrypted (nothing is written then)
+    '''
+    sample = source.read(sample_size)
+    cipher = CipherMsg(_sample_text(sample, len(sample) < sample_size))
+    if method == 'adaptive':
+        cipher.decrypt_adaptive(valid_words)                  # raises DecryptionError, and doesn't decode the sample twice
+    else:
+        cipher.decrypt_msg(valid_words, method, raise_error=True)
+    new_file.write(shift_text(sample, cipher.best_shift))
+    shift_stream(source, new_file, cipher.best_shift, chunk_size)
+    return cipher
+
+
+def encode_story(plaintext_file, new_file_name, shift, stream=False):
+    '''
+    Reads in a text file, shifts each letter by a given shift value, and saves the encoded message to a text file.
 
     Inputs:
     - plaintext_file (string): Name of file to read in
     - new_file_name (string): Name of new file to be created
+    - shift (int): the amount by which to shift every letter
+    - stream (bool): if True, the file is encoded in chunks instead of being read in all at once (see shift_file())
     Outputs:
     - Nothing (saves the encoded message to a text file)
     '''
-    listwords = Message(read_story(plaintext_file))                    # reads in the text file contents as a Message object
-    encoded = listwords.apply_shift(shift)                        # applies the given shift
-    encoded_txt = open(new_file_name, 'w')                        # opens new text file with writing capability 
-    encoded_txt.write(encoded)                                    # writes the encoded message to the new file
-    encoded_txt.close()                                           # closes the new file
+    start = _hook is not None and time.perf_counter()
+    if stream:
+        shift_file(plaintext_file, new_file_name, shift)
+    else:
+        encoded = shift_text(read_story(plaintext_file), shift)   # reads in the text file contents and applies the given shift
+        encoded_txt = open(new_file_name, 'w')                    # opens new text file with writing capability 
+        encoded_txt.write(encoded)                                # writes the encoded message to the new file
+        encoded_txt.close()                                       # closes the new file
+    if start:
+        _report('encode_story', start, bytes=os.path.getsize(plaintext_file))
 
 
-def decode_story(cipher_file, new_file_name):
+def decode_story(cipher_file, new_file_name, stream=False, valid_words='words.txt', method='words'):
     '''
     Determines the proper shift necessary to decode the encrypted story. Writes the resulting decrypted story to the file 'decoded_story.txt'.
 
+    With stream=True, the shift is found from the first STREAM_SAMPLE_SIZE bytes of the file only, and the file is then decoded
+    in chunks (see shift_file()), so files of any size can be decoded without reading them in all at once.
+
     Inputs:
         - cipher_file (string): name of the file to be decrypted
         - new_file_name (string): name of the new file in which to write the decrypted message
+        - stream (bool): if True, decode the file in chunks using a shift found from its start
+        - valid_words (WordIndex, list of strings or file name): the valid English words (see CipherMsg.decrypt_msg())
+        - method (string): 'words', 'frequency' or 'adaptive' (see CipherMsg.decrypt_msg())
     Outputs:
-        - None (saves a file with the decryped story)
+        - (CipherMsg): the message used to find the shift, with its best_shift and scores (also saves a file with the decryped story)
+    Raises:
+        - DecryptionError: if the file could not be decrypted (nothing is written then)
     '''
-    listwords = CipherMsg(read_story(cipher_file))              # reads in the text file as a CipherMsg object
-    decoded = listwords.decrypt_msg(load_words())                  # uses the decrypt_msg function to decode the message
-    decoded_txt = open(new_file_name, 'w')                         # opens new text file with writing capability
-    decoded_txt.write(decoded)                                     # writes the decoded message to the new file
-    decoded_txt.close()                                            # closes the new file
+    start = _hook is not None and time.perf_counter()
+    listwords = CipherMsg(read_sample(cipher_file) if stream else read_story(cipher_file))   # reads in the text file as a CipherMsg object
+    try:
+        decoded = listwords.decrypt_msg(valid_words, method, raise_error=True)   # uses the decrypt_msg function to decode the message
+    except DecryptionError:
+        raise DecryptionError(f'{cipher_file} could not be decrypted') from None
+    if stream:
+        shift_file(cipher_file, new_file_name, listwords.best_shift)
+    else:
+        decoded_txt = open(new_file_name, 'w')                     # opens new text file with writing capability
+        decoded_txt.write(decoded)                                 # writes the decoded message to the new file
+        decoded_txt.close()                                        # closes the new file
+    if start:
+        _report('decode_story', start, bytes=os.path.getsize(cipher_file))
+    return listwords
 
 
+_worker_words = None      # the word index of a decode_stories() worker process, loaded once by _init_decode_worker()
 
-if __name__ == '__main__':
+
+def _init_decode_worker(word_file):
+    '''
+    Loads the word index once when a decode_stories() worker process starts.
+    '''
+    global _worker_words
+    _worker_words = load_words(word_file)
+
+
+def _decode_worker(job):
+    '''
+    Decodes one file in a decode_stories() worker process, returning its summary instead of raising on failure.
+    '''
+    cipher_file, new_file_name, stream, method, error = job
+    summary = {'file': cipher_file, 'output': new_file_name, 'shift': None, 'score': None, 'error': error}
+    if error is not None:                                           # found by decode_stories() before starting the job
+        return summary
+    if os.path.realpath(new_file_name) == os.path.realpath(cipher_file):
+        summary['error'] = f'{new_file_name} would overwrite the file being decoded'   # writing it would truncate the input
+        return summary
+    try:
+        cipher = decode_story(cipher_file, new_file_name, stream, _worker_words, method)
+        summary['shift'] = cipher.best_shift
+        summary['score'] = cipher.scores[cipher.best_shift]
+    except (OSError, UnicodeDecodeError, ValueError) as error:
+        summary['error'] = str(error)
+    return summary
+
+
+def decode_stories(cipher_files, output_dir, workers=None, stream=False, word_file='words.txt', method='words'):
+    '''
+    Decodes many encrypted files in parallel using a pool of worker processes. Each worker loads the word index once when it
+    starts and then decodes and writes out its share of the files with decode_story().
+
+    Inputs:
+        - cipher_files (string): a directory (all files in it are decoded) or a glob pattern such as 'ciphers/*.txt'
+        - output_dir (string): directory in which to save the decoded files, under the same file names (created if missing);
+            files which would be saved over themselves, or which share their file name with another input file, are
+            skipped with an error
+        - workers (int): number of worker processes (defaults to the number of CPUs)
+        - stream (bool): if True, each file is decoded in chunks (see decode_story())
+        - word_file (string): name of the word file each worker loads
+        - method (string): 'words', 'frequency' or 'adaptive' (see CipherMsg.decrypt_msg())
+    Output:
+        - (list of dicts): one summary per file, in file name order, with the keys 'file', 'output', 'shift', 'score' (the
+            score of the chosen shift, see CipherMsg.scores) and 'error' (None, or why the file could not be decoded)
+    '''
+    import concurrent.futures                                # imported here so scripts that don't use it start faster
+    import glob
+    if os.path.isdir(cipher_files):
+        file_names = [os.path.join(cipher_files, name) for name in os.listdir(cipher_files)]
+    else:
+        file_names = glob.glob(cipher_files)
+    file_names = sorted(name for name in file_names if os.path.isfile(name))
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = [os.path.join(output_dir, os.path.basename(name)) for name in file_names]
+    counts = collections.Counter(os.path.normcase(output) for output in outputs)
+    jobs = [(name, output, stream, method,
+             f'{output} would also be written for another input file' if counts[os.path.normcase(output)] > 1 else None)
+            for name, output in zip(file_names, outputs)]
+    if not jobs:
+        return []
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_decode_worker, initargs=(word_file,)) as executor:
+        return list(executor.map(_decode_worker, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+
+
+EXIT_NOT_DECRYPTED = 1     # exit code when an input could not be decrypted
+EXIT_IO_ERROR = 3          # exit code when an input could not be read (argparse uses 2 for usage errors)
+
+
+def interactive():
+    '''
+    Prompts the user to encrypt or decrypt a piece of text or a file. Used when the script is run without any arguments.
+    '''
     print('Welcome!')
     print('=================================================================================')
     en_decode = input('Would you like to encrypt or decrypt? Type "E" for encrypt or "D" for decrypt. ')
@@ -375,6 +1972,82 @@ if __name__ == '__main__':
         print('Entry not recognized. Please enter "E" for encrypt or "D" for decrypt. ')
 
 
+def _open_inputs(file_names):
+    '''
+    Opens each named file for reading in binary, with '-' (or no files at all) meaning stdin. Yields each name with its file
+    object, or with the OSError raised when opening it.
+    '''
+    for name in file_names or ['-']:
+        if name == '-':
+            yield name, sys.stdin.buffer
+            continue
+        try:
+            f = open(name, 'rb')
+        except OSError as error:
+            yield name, error
+            continue
+        with f:
+            yield name, f
+
+
+def main(argv=None):
+    '''
+    Command-line entry point. Encrypts, decrypts (with a known shift) or cracks (finds the shift of) each given file, or stdin,
+    writing the results to stdout. Run with --help for the options, or with no arguments at all for the interactive prompts.
+
+    Input:
+        - argv (list of strings): the command-line arguments (defaults to sys.argv[1:])
+    Output:
+        - (int): the exit code: 0 on success, EXIT_NOT_DECRYPTED if any input could not be decrypted, or EXIT_IO_ERROR if
+            any input could not be read
+    '''
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv:
+        interactive()
+        return 0
+
+    import argparse
+    parser = argparse.ArgumentParser(prog='Caesar Cipher.py', description='Encrypt, decrypt or crack Caesar ciphers.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in [('encrypt', 'shift every letter by SHIFT'), ('decrypt', 'undo a shift of SHIFT')]:
+        command_parser = commands.add_parser(command, help=help_text)
+        command_parser.add_argument('-s', '--shift', type=int, required=True)
+        command_parser.add_argument('files', nargs='*', help="files to read ('-' or none for stdin)")
+    crack_parser = commands.add_parser('crack', help='find the shift of each input and decode it')
+    crack_parser.add_argument('files', nargs='*', help="files to read ('-' or none for stdin)")
+    crack_parser.add_argument('-m', '--method', choices=['words', 'frequency', 'adaptive'], default='words')
+    crack_parser.add_argument('-w', '--words', default='words.txt', help='word file (default: words.txt)')
+    crack_parser.add_argument('--json', action='store_true',
+                              help='report the shift, score and confidence of each input as a JSON line on stderr')
+    args = parser.parse_args(argv)
+
+    output = sys.stdout.buffer
+    exit_code = 0
+    valid_words = load_words(args.words) if args.command == 'crack' and args.method != 'frequency' else None
+    for name, source in _open_inputs(args.files):
+        if isinstance(source, OSError):
+            print(f'{parser.prog}: {source}', file=sys.stderr)
+            exit_code = max(exit_code, EXIT_IO_ERROR)
+            continue
+        if args.command != 'crack':
+            shift_stream(source, output, args.shift if args.command == 'encrypt' else -args.shift)
+            continue
+        report = {'file': name, 'shift': None, 'score': None, 'confidence': None, 'decrypted': False}
+        try:
+            cipher = crack_stream(source, output, valid_words or args.words, args.method)
+            report.update(shift=cipher.best_shift, score=cipher.scores[cipher.best_shift], confidence=cipher.confidence,
+                          decrypted=True)
+        except ValueError as error:
+            print(f'{parser.prog}: {name}: {error}', file=sys.stderr)
+            exit_code = max(exit_code, EXIT_NOT_DECRYPTED)
+        if args.json:
+            import json
+            print(json.dumps(report), file=sys.stderr)
+    output.flush()
+    return exit_code
+
+
 
 # Testing
 def test_methods():
@@ -392,22 +2065,133 @@ def test_methods():
     msg.change_shift(23)
     print("PlainMsg change_shift() check passes? ", msg.get_encrypted_msg() == "Ebiil, Tloia!")
 
+    # test of the compact message classes
+    compact = CompactPlainMsg('Hello, World!', 5)
+    print("CompactPlainMsg get_encrypted_msg() check passes? ", compact.get_encrypted_msg() == "Mjqqt, Btwqi!" and compact.get_message_text() == 'Hello, World!')
+    compact.change_shift(23)
+    print("CompactPlainMsg change_shift() check passes? ", compact.get_encrypted_msg() == "Ebiil, Tloia!" and compact.shift_dict == msg.shift_dict)
+    compact_cipher = CompactCipherMsg('Mjqqt, Btwqi!')
+    print("CompactCipherMsg decrypt_msg() check passes? ", compact_cipher.decrypt_msg(load_words()) == 'Hello, World!' and compact_cipher.decoded_msg == 'Hello, World!' and compact_cipher.best_shift == 21)
+    print("CompactCipherMsg decrypt_adaptive() check passes? ", CompactCipherMsg('Mjqqt, Btwqi!').decrypt_adaptive(load_words()) == (21, compact_cipher.confidence))
+    texts = ['Hello, World! This is message number %d.' % n for n in range(100)]
+    overhead = lambda messages: message_memory(messages) - len(texts[0])
+    print("Compact messages memory check passes? ", overhead([CompactPlainMsg(text, 5) for text in texts]) * 2 <= overhead([PlainMsg(text, 5) for text in texts])
+          and overhead([CompactCipherMsg(text) for text in texts]) * 2 <= overhead([CipherMsg(text) for text in texts]))
+
+    # test of the shift_text function
+    print("shift_text() check passes? ", shift_text('Hello, World!', 5) == 'Mjqqt, Btwqi!' and shift_text(b'Hello, World!', -21) == b'Mjqqt, Btwqi!')
+
     # test of the get_words function
     print("get_words() check passes? ", get_words("Hello! How are you today, ma'am?") == ['Hello', 'How', 'are', 'you', 'today', 'maam'])
 
+    # test of the iter_words function
+    print("iter_words() check passes? ", list(iter_words(["Hello! How a", "re you to", "day, ma'", "am? - "])) == ['hello', 'how', 'are', 'you', 'today', 'maam'])
+
     # test of the count_valid_words function
     valid_words = load_words()
     print("count_valid_words check passes? ", count_valid_words(['merkle', 'identity', 'tloia', 'decentralized'], valid_words) == 2)
+    print("count_valid_words list check passes? ", count_valid_words(['merkle', 'identity', 'tloia'], ['identity', 'merkle']) == 2)
+    print("load_words() WordIndex check passes? ", load_words(valid_words) is valid_words and 'identity' in valid_words)
     
+    # test of the score_shifts function
+    cover_letter = get_words(read_story('EncodedCoverLetter.txt'))
+    print("score_shifts() check passes? ", score_shifts(cover_letter, valid_words) == [count_valid_words(get_words(Message(' '.join(cover_letter)).apply_shift(i)), valid_words) for i in range(26)])
+
     # test of the CipherMsg class
     cipher_example = CipherMsg('Svnpj dpss nla fvb myvt H av G; pthnpuhapvu dpss nla fvb lclyfdolyl. - Hsilya Lpuzalpu')
     print("CipherMsg decrypt_msg() check passes? ", cipher_example.decrypt_msg(load_words()) == 'Logic will get you from A to Z; imagination will get you everywhere. - Albert Einstein')
 
+    cipher_example = CipherMsg('Svnpj dpss nla fvb myvt H av G; pthnpuhapvu dpss nla fvb lclyfdolyl. - Hsilya Lpuzalpu')
+    print("CipherMsg decrypt_msg() frequency check passes? ", cipher_example.decrypt_msg(valid_words, method='frequency') == 'Logic will get you from A to Z; imagination will get you everywhere. - Albert Einstein')
+    cover_letter = CipherMsg(read_story('EncodedCoverLetter.txt'))
+    print("CipherMsg decrypt_msg() frequency matches words? ", cover_letter.decrypt_msg(method='frequency') == cover_letter.decrypt_msg(valid_words))
+
+    # test of adaptive cracking
+    print("CipherMsg decrypt_adaptive() check passes? ", CipherMsg(read_story('EncodedCoverLetter.txt')).decrypt_adaptive(valid_words)[0] == 17 and round(shift_confidence([0] * 25 + [9]), 4) == 0.9987)
+    adaptive = CipherMsg('Mjqqt, Btwqi!')
+    print("CipherMsg decrypt_msg() adaptive check passes? ", adaptive.decrypt_msg(valid_words, method='adaptive') == 'Hello, World!' and adaptive.best_shift == 21 and 0.5 < adaptive.confidence < 0.999)
+    for method in ('adaptive', 'words'):
+        try:
+            CipherMsg('Hello, World!').decrypt_msg(valid_words, method=method, raise_error=method == 'words')
+            print(f"CipherMsg decrypt_msg() {method} error check passes? ", False)
+        except DecryptionError:
+            print(f"CipherMsg decrypt_msg() {method} error check passes? ", True)
+    try:
+        CipherMsg('Hello, World!').decrypt_adaptive(valid_words)
+        print("CipherMsg decrypt_adaptive() error check passes? ", False)
+    except DecryptionError:
+        print("CipherMsg decrypt_adaptive() error check passes? ", True)
+
+    # test of the batch functions (these need NumPy)
+    print("encrypt_batch() check passes? ", encrypt_batch(['Hello, World!', 'Happy Birthday!'], [5, 1]) == ['Mjqqt, Btwqi!', 'Ibqqz Cjsuiebz!'])
+    best_shifts, decoded = crack_batch([cipher_example.get_message_text(), 'Mjqqt, Btwqi!'], valid_words)
+    print("crack_batch() check passes? ", best_shifts.tolist() == [19, 21] and decoded[1] == 'Hello, World!')
+
+    # test of the Vigenère functions (these need NumPy)
+    print("vigenere_shift() check passes? ", vigenere_shift('Attack at dawn!', 'lemon') == 'Lxfopv ef rnhr!' and vigenere_shift('Lxfopv ef rnhr!', 'LEMON', decrypt=True) == 'Attack at dawn!')
+    cover_text = cover_letter.apply_shift(17)
+    vigenere_example = VigenereMsg(vigenere_shift(cover_text, 'lemon'))
+    print("estimate_key_length() check passes? ", estimate_key_length(vigenere_example.get_message_text()) == 5)
+    print("VigenereMsg decrypt_msg() check passes? ", vigenere_example.decrypt_msg(valid_words) == cover_text and vigenere_example.get_key() == 'lemon')
+
+    # test of the instrumentation
+    stats = Instrumentation()
+    previous = set_instrumentation(stats)
+    CipherMsg('Mjqqt, Btwqi!').decrypt_msg(valid_words)
+    set_instrumentation(previous)
+    print("Instrumentation check passes? ", stats.as_dict()['score_shifts']['lookups'] == 2 and stats.as_dict()['decrypt_msg']['calls'] == 1)
+
+    # test of the ResultCache class
+    cache = ResultCache(max_bytes=1000)
+    previous = set_result_cache(cache)
+    first = CipherMsg('Mjqqt, Btwqi!').decrypt_msg(valid_words)
+    second = CipherMsg('Mjqqt, Btwqi!')
+    print("ResultCache decrypt_msg() check passes? ", first == second.decrypt_msg(valid_words) == 'Hello, World!' and second.best_shift == 21 and cache.stats()['hits'] == 1)
+    second.scores[5] = 999
+    third = CipherMsg('Mjqqt, Btwqi!')
+    third.decrypt_msg(valid_words)
+    print("ResultCache scores copy check passes? ", third.scores[5] == 0 and third.scores is not second.scores)
+    fourth = CipherMsg('Mjqqt, Btwqi!')
+    fourth.decrypt_msg(['hello'])
+    print("ResultCache word list check passes? ", fourth.best_shift == 21 and fourth.scores[21] == 1 and cache.stats()['hits'] == 2)
+    CipherMsg('Ebiil, Tloia!').decrypt_msg(valid_words)
+    CipherMsg('Ifmmp, Xpsme!').decrypt_msg(valid_words)
+    print("ResultCache eviction check passes? ", cache.stats()['evictions'] > 0 and cache.size <= cache.max_bytes)
+    set_result_cache(previous)
+
     # test of decode_story function
     decode_story('EncodedCoverLetter.txt', 'DecodedCoverLetter.txt')
     # saves file titled 'DecodedCoverLetter.txt' with entire decoded message
+    summary = decode_stories('EncodedCoverLetter.txt', 'DecodedStories', workers=2)
+    print("decode_stories() check passes? ", summary[0]['shift'] == 17 and read_story('DecodedStories/EncodedCoverLetter.txt') == read_story('DecodedCoverLetter.txt'))
+    summary = decode_stories('DecodedStories', 'DecodedStories', workers=1, stream=True)
+    print("decode_stories() same directory check passes? ", 'overwrite' in summary[0]['error'] and read_story('DecodedStories/EncodedCoverLetter.txt') == read_story('DecodedCoverLetter.txt'))
+    os.remove('DecodedStories/EncodedCoverLetter.txt')
+    for folder in ('DecodedStories/a', 'DecodedStories/b'):
+        os.makedirs(folder)
+        with open(folder + '/EncodedCoverLetter.txt', 'w') as f:
+            f.write(read_story('EncodedCoverLetter.txt'))
+    summary = decode_stories('DecodedStories/*/EncodedCoverLetter.txt', 'DecodedStories', workers=2)
+    print("decode_stories() duplicate name check passes? ", len(summary) == 2 and all('another input' in s['error'] for s in summary) and not os.path.exists('DecodedStories/EncodedCoverLetter.txt'))
+    for folder in ('DecodedStories/a', 'DecodedStories/b'):
+        os.remove(folder + '/EncodedCoverLetter.txt')
+        os.rmdir(folder)
+    os.rmdir('DecodedStories')
+    decode_story('EncodedCoverLetter.txt', 'DecodedCoverLetterStream.txt', stream=True)
+    print("decode_story() stream check passes? ", read_story('DecodedCoverLetterStream.txt') == read_story('DecodedCoverLetter.txt'))
+    encode_story('DecodedCoverLetterStream.txt', 'DecodedCoverLetterStream.txt.enc', 9, stream=True)
+    print("encode_story() stream check passes? ", read_story('DecodedCoverLetterStream.txt.enc') == read_story('EncodedCoverLetter.txt'))
+    with open('EncodedCoverLetter.txt', 'rb') as source, open('DecodedCoverLetterStream.txt', 'wb') as new_file:
+        crack_stream(source, new_file, valid_words, sample_size=100, chunk_size=64)
+    print("crack_stream() check passes? ", read_story('DecodedCoverLetterStream.txt') == read_story('DecodedCoverLetter.txt'))
+    os.remove('DecodedCoverLetterStream.txt')
+    os.remove('DecodedCoverLetterStream.txt.enc')
     print('================================================')
 
 
 # To run the above tests, uncomment the line below
-#test_methods()
\ No newline at end of file
+#test_methods()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
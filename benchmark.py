@@ -0,0 +1,274 @@
+'''
+Benchmarks the hot paths of Caesar Cipher.py on generated text of different sizes, from a tweet up to 100 MB.
+
+Each benchmark is timed a few times and the fastest run is kept, then run once more under tracemalloc to record its peak
+memory. Recovering the key of a Vigenere cipher is timed for several key lengths at each size from 64 KB to 10 MB, and the
+memory taken up by each message is measured for the message classes and their compact versions. The results are saved as
+JSON, and if a baseline file is given (or benchmark_baseline.json exists) every benchmark is compared to it: any that got
+slower, or needed more peak memory, by more than the tolerance is reported and the script exits with code 1.
+
+The inputs of each size are only generated when its benchmarks are about to run, and are freed before the next size, so
+the run never holds more than one size's text in memory.
+
+Example usage:
+    python benchmark.py --sizes tweet 64KB 1MB                   # quick run
+    python benchmark.py --save-baseline                          # record a new baseline
+    python benchmark.py --baseline benchmark_baseline.json       # compare against it
+'''
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from cipher_loader import load_cipher_module
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SIZES = {'tweet': 280, '64KB': 64 * 1024, '1MB': 1 << 20, '10MB': 10 << 20, '100MB': 100 << 20}
+SEED = 2024                 # seed for the generated text, so every run benchmarks the same input
+SHIFT = 11                  # shift used to encrypt the generated text
+DEFAULT_BASELINE = os.path.join(HERE, 'benchmark_baseline.json')
+VIGENERE_SIZES = ('64KB', '1MB', '10MB')     # sizes of the Vigenere benchmarks (too short a text has too few letters per key letter)
+VIGENERE_KEY_LENGTHS = (3, 8, 16)
+
+
+def make_corpus(size, words, seed=SEED):
+    '''
+    Generates about size bytes of English-looking text from random dictionary words, with capitals, punctuation and line
+    breaks, using a fixed seed so the text is the same on every run.
+
+    Inputs:
+        - size (int): the length of the text in bytes
+        - words (list of strings): the words to choose from
+        - seed (int): seed of the random number generator
+    Output:
+        - (string): the generated text (exactly size characters long)
+    '''
+    rng = random.Random(seed)
+    sentences = []
+    length = 0
+    while length < size:
+        sentence = rng.choices(words, k=rng.randint(4, 16))
+        sentence[0] = sentence[0].capitalize()
+        sentence = ' '.join(sentence) + rng.choice(['.', '.', '!', '?', ',']) + rng.choice([' ', ' ', '\n'])
+        sentences.append(sentence)
+        length += len(sentence)
+    return ''.join(sentences)[:size]
+
+
+def time_best(function, repeat, min_seconds=0.05):
+    '''
+    Times function repeat times and returns the fastest time in seconds per call. Fast functions are called in a loop, enough
+    times to take at least min_seconds, so that timer resolution doesn't swamp the result.
+    '''
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+        loops *= 10
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best
+
+
+def peak_memory(function):
+    '''
+    Runs function once under tracemalloc and returns the most memory (in bytes) it had allocated at any one time.
+    '''
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def build_benchmarks(cc, size_names, workdir):
+    '''
+    Generates the benchmarks to run as (name, number of bytes processed, function) tuples. Benchmarks which don't depend on
+    the size of the message (building dictionaries and loading words) are only included once. The inputs of each size are
+    created when its first benchmark is asked for and dropped before the next size, so they are never all held at once.
+    '''
+    word_file = os.path.join(HERE, 'words.txt')
+    valid_words = cc.load_words(word_file)
+    words = sorted(valid_words)
+    message = cc.Message('Hello, World!')
+    yield 'build_shift_dict', None, lambda: [message.build_shift_dict(shift) for shift in range(26)]
+    yield ('load_words (cold)', os.path.getsize(word_file),
+           lambda: cc.WordIndex.from_file(word_file,
+                                          cache_file=os.path.join(workdir, 'missing.cache.d', 'words.cache')).patterns)
+    yield 'load_words (cached)', os.path.getsize(word_file), lambda: cc.load_words(word_file).patterns
+    for size_name in size_names:
+        size = SIZES[size_name]
+        cipher_text = cc.shift_text(make_corpus(size, words), SHIFT)
+        cipher_words = cc.get_words(cipher_text)
+        cipher_file = os.path.join(workdir, f'cipher_{size_name}.txt')
+        with open(cipher_file, 'w') as f:
+            f.write(cipher_text)
+        decoded_file = os.path.join(workdir, 'decoded.txt')
+        yield from [
+            (f'apply_shift [{size_name}]', size, lambda text=cipher_text: cc.Message(text).apply_shift(26 - SHIFT)),
+            (f'get_words [{size_name}]', size, lambda text=cipher_text: cc.get_words(text)),
+            (f'count_valid_words [{size_name}]', size, lambda words=cipher_words: cc.count_valid_words(words, valid_words)),
+            (f'decrypt_msg [{size_name}]', size, lambda text=cipher_text: cc.CipherMsg(text).decrypt_msg(valid_words)),
+            (f'decrypt_msg frequency [{size_name}]', size,
+             lambda text=cipher_text: cc.CipherMsg(text).decrypt_msg(valid_words, method='frequency')),
+            (f'decrypt_adaptive [{size_name}]', size, lambda text=cipher_text: cc.CipherMsg(text).decrypt_adaptive(valid_words)),
+            (f'decode_story [{size_name}]', size,
+             lambda name=cipher_file: cc.decode_story(name, decoded_file, valid_words=valid_words)),
+            (f'decode_story stream [{size_name}]', size,
+             lambda name=cipher_file: cc.decode_story(name, decoded_file, stream=True, valid_words=valid_words)),
+        ]
+        del cipher_text, cipher_words                                   # free this size before generating the next
+        os.remove(cipher_file)
+
+
+def build_vigenere_benchmarks(cc, size_names):
+    '''
+    Generates benchmarks of recovering the key of a Vigenere cipher, for every combination of text size (of those in
+    VIGENERE_SIZES) and key length in VIGENERE_KEY_LENGTHS, as (name, number of bytes processed, function) tuples. Each
+    cipher text is only created when its benchmark is asked for. Reports any key that isn't recovered, since its timing
+    would be meaningless.
+    '''
+    valid_words = cc.load_words(os.path.join(HERE, 'words.txt'))
+    words = sorted(valid_words)
+    rng = random.Random(SEED)
+    for size_name in size_names:
+        size = SIZES[size_name]
+        text = make_corpus(size, words)
+        for key_length in VIGENERE_KEY_LENGTHS:
+            key = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(key_length))
+            cipher_text = cc.vigenere_shift(text, key)
+            cipher = cc.VigenereMsg(cipher_text)
+            cipher.decrypt_msg(valid_words)
+            if cipher.get_key() != key:
+                print(f'Vigenere [{size_name}, key {key_length}]: recovered {cipher.get_key()!r} instead of {key!r}',
+                      file=sys.stderr)
+            yield (f'VigenereMsg decrypt_msg [{size_name}, key {key_length}]', size,
+                   lambda text=cipher_text: cc.VigenereMsg(text).decrypt_msg(valid_words))
+            del cipher_text, cipher
+        del text
+
+
+def measure_messages(cc, count=100000):
+    '''
+    Measures the memory each message takes up when holding count tweet-sized messages, for the message classes and their
+    compact versions. The overhead is what is left after taking off the length of the text itself.
+
+    Output:
+        - (dict): maps each class name to its 'bytes_per_message' and 'overhead_bytes'
+    '''
+    words = sorted(cc.load_words(os.path.join(HERE, 'words.txt')))
+    corpus = make_corpus(count * 64, words)
+    texts = [corpus[n:n + 64] for n in range(0, len(corpus), 64)]
+    results = {}
+    for cls, args in [(cc.PlainMsg, (SHIFT,)), (cc.CompactPlainMsg, (SHIFT,)), (cc.CipherMsg, ()), (cc.CompactCipherMsg, ())]:
+        per_message = cc.message_memory([cls(text, *args) for text in texts])
+        results[cls.__name__] = {'bytes_per_message': per_message, 'overhead_bytes': per_message - 64}
+        print(f'{cls.__name__ + " memory":45} {per_message:12.1f} bytes/message {per_message - 64:10.1f} bytes overhead',
+              flush=True)
+    return results
+
+
+def run_benchmarks(benchmarks, repeat, measure_memory=True):
+    '''
+    Times every benchmark and measures its peak memory, printing each result as it goes. The benchmarks can be given by a
+    generator, in which case each is dropped as soon as it has run.
+
+    Output:
+        - (dict): maps each benchmark name to its 'seconds', 'mb_per_s' (None if it doesn't depend on size) and 'peak_bytes'
+    '''
+    results = {}
+    for name, size, function in benchmarks:
+        seconds = time_best(function, repeat if (size or 0) < SIZES['10MB'] else 1)   # big inputs are only timed once
+        result = {'seconds': seconds, 'mb_per_s': size / seconds / 1e6 if size else None,
+                  'peak_bytes': peak_memory(function) if measure_memory else None}
+        results[name] = result
+        throughput = f"{result['mb_per_s']:10.2f} MB/s" if size else ' ' * 15
+        memory = f"{result['peak_bytes'] / 1e6:10.2f} MB peak" if measure_memory else ''
+        print(f'{name:45} {seconds * 1000:12.3f} ms {throughput} {memory}', flush=True)
+        del function                                                    # don't keep its input alive while building the next
+    return results
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Compares results to a baseline, returning a message for each benchmark that got slower, or whose peak memory grew, by
+    more than tolerance (a fraction, e.g. 0.25 for 25%). Peak memory is only compared when both runs measured it.
+    '''
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['seconds'], result['seconds']
+        if after > before * (1 + tolerance):
+            regressions.append(f'{name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms ({after / before - 1:+.0%})')
+        before, after = baseline[name].get('peak_bytes'), result['peak_bytes']
+        if before and after is not None and after > before * (1 + tolerance):
+            regressions.append(f'{name}: {before:,} -> {after:,} bytes peak ({after / before - 1:+.0%})')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the hot paths of Caesar Cipher.py.')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES),
+                        help='input sizes to benchmark (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per benchmark; the fastest is kept (default: 5)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory runs')
+    parser.add_argument('--no-vigenere', action='store_true', help='skip the Vigenere key recovery benchmarks')
+    parser.add_argument('--output', default='benchmark_results.json', help='where to save the results')
+    parser.add_argument('--baseline', help=f'results to compare against (default: {os.path.basename(DEFAULT_BASELINE)} '
+                                           'if it exists)')
+    parser.add_argument('--save-baseline', action='store_true', help='also save the results as the default baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='how much slower than the baseline counts as a regression (default: 0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    cc = load_cipher_module()
+    with tempfile.TemporaryDirectory() as workdir:
+        benchmarks = build_benchmarks(cc, [name for name in SIZES if name in args.sizes], workdir)
+        if not args.no_vigenere:
+            benchmarks = itertools.chain(benchmarks,
+                                         build_vigenere_benchmarks(cc, [name for name in VIGENERE_SIZES if name in args.sizes]))
+        results = run_benchmarks(benchmarks, args.repeat, not args.no_memory)
+    message_memory = None if args.no_memory else measure_messages(cc)
+
+    report = {'python': platform.python_version(), 'platform': platform.platform(), 'seed': SEED,
+              'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results, 'message_memory': message_memory}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    baseline_file = args.baseline or (DEFAULT_BASELINE if os.path.exists(DEFAULT_BASELINE) and not args.save_baseline
+                                      else None)
+    if baseline_file is None:
+        return 0
+    with open(baseline_file) as f:
+        regressions = compare(results, json.load(f)['results'], args.tolerance)
+    if regressions:
+        print(f'\nREGRESSIONS against {baseline_file}:', file=sys.stderr)
+        for regression in regressions:
+            print(f'  {regression}', file=sys.stderr)
+        return 1
+    print(f'\nNo regressions against {baseline_file}.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
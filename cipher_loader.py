@@ -0,0 +1,24 @@
+'''
+Imports 'Caesar Cipher.py' for the other scripts (it can't be imported by name because of the space in it).
+'''
+
+import importlib.util
+import os
+import sys
+
+MODULE_NAME = 'caesar_cipher'
+
+
+def load_cipher_module():
+    '''
+    Imports 'Caesar Cipher.py' once, registering it as the caesar_cipher module so that worker processes can find its
+    functions, and returns the module.
+    '''
+    if MODULE_NAME in sys.modules:
+        return sys.modules[MODULE_NAME]
+    spec = importlib.util.spec_from_file_location(MODULE_NAME, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                            'Caesar Cipher.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,271 @@
+'''
+An asyncio server that encrypts, decrypts and cracks Caesar ciphers for many clients at once, and a load-test client for it.
+
+The server loads the word index once at startup and keeps it (and the shift tables) for as long as it runs. Clients send
+one JSON request per line and get one JSON response per line, in order, on each connection:
+
+    {"op": "encrypt", "text": "Hello, World!", "shift": 5}      ->  {"ok": true, "text": "Mjqqt, Btwqi!"}
+    {"op": "decrypt", "text": "Mjqqt, Btwqi!", "shift": 5}      ->  {"ok": true, "text": "Hello, World!"}
+    {"op": "crack", "text": "Mjqqt, Btwqi!"}                    ->  {"ok": true, "text": "Hello, World!", "shift": 21, "score": 2}
+
+Any "id" in a request is copied to its response, crack takes an optional "method" ('words', 'frequency' or 'adaptive')
+and also gives the confidence in the shift (null for 'frequency'), and failures are reported as
+{"ok": false, "error": "..."}. Cracking runs in a pool of worker processes (each with its own warm word index) so that it
+doesn't hold up the event loop.
+
+Example usage:
+    python service.py serve --port 8765                      # or --unix /tmp/caesar.sock
+    python service.py loadtest --port 8765 --connections 32 --requests 5000 --op crack
+'''
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+from cipher_loader import load_cipher_module
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MAX_LINE = 16 << 20          # longest request or response line in bytes
+INLINE_SHIFT_SIZE = 1 << 16  # encrypt/decrypt requests longer than this are run in a thread rather than on the event loop
+
+
+cc = load_cipher_module()
+_words = None           # the warm word index of this process, loaded once by load_index()
+
+
+def load_index(word_file):
+    '''
+    Loads the word index of the server (or of a worker process) once.
+    '''
+    global _words
+    _words = cc.load_words(word_file)
+
+
+def crack(text, method):
+    '''
+    Cracks one message using the warm word index, returning its decoded text, shift and score.
+    '''
+    cipher = cc.CipherMsg(text)
+    decoded = cipher.decrypt_msg(_words, method, raise_error=True)
+    return {'text': decoded, 'shift': cipher.best_shift, 'score': cipher.scores[cipher.best_shift],
+            'confidence': cipher.confidence}
+
+
+class CipherServer(object):
+    '''
+    Handles client connections on one event loop, answering each request line with a response line (see the module
+    docstring for the protocol).
+    '''
+
+    def __init__(self, word_file='words.txt', workers=None):
+        '''
+        Initializes a CipherServer, loading the word index and starting the worker processes.
+
+        Inputs:
+            - word_file (string): name of the word file to load
+            - workers (int): number of worker processes for cracking (defaults to the number of CPUs); with 0, cracking runs
+                in threads of this process instead
+        '''
+        load_index(word_file)
+        if workers == 0:
+            self.executor = concurrent.futures.ThreadPoolExecutor()
+        else:
+            self.executor = concurrent.futures.ProcessPoolExecutor(workers, initializer=load_index, initargs=(word_file,))
+
+    async def handle(self, request):
+        '''
+        Answers one decoded JSON request, returning the response as a dict.
+        '''
+        op = request.get('op')
+        text = request.get('text')
+        if not isinstance(text, str):
+            raise ValueError('"text" must be a string')
+        loop = asyncio.get_running_loop()
+        if op in ('encrypt', 'decrypt'):
+            shift = request.get('shift')
+            if not isinstance(shift, int) or isinstance(shift, bool):   # JSON true and false would pass as 1 and 0
+                raise ValueError('"shift" must be an integer')
+            if op == 'decrypt':
+                shift = -shift
+            if len(text) > INLINE_SHIFT_SIZE:
+                return {'text': await loop.run_in_executor(None, cc.shift_text, text, shift)}
+            return {'text': cc.shift_text(text, shift)}
+        if op == 'crack':
+            method = request.get('method', 'words')
+            if method not in ('words', 'frequency', 'adaptive'):
+                raise ValueError(f"Unknown method {method!r}, expected 'words', 'frequency' or 'adaptive'")
+            return await loop.run_in_executor(self.executor, crack, text, method)
+        raise ValueError(f"Unknown op {op!r}, expected 'encrypt', 'decrypt' or 'crack'")
+
+    async def serve_client(self, reader, writer):
+        '''
+        Reads request lines from one client until it disconnects, writing a response line for each.
+        '''
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:                                  # line longer than MAX_LINE
+                    writer.write(b'{"ok": false, "error": "request too long"}\n')
+                    break
+                if not line:
+                    break
+                response = {}
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('request must be a JSON object')
+                    if 'id' in request:
+                        response['id'] = request['id']
+                    response.update(await self.handle(request))
+                    response['ok'] = True
+                except ValueError as error:                         # includes invalid JSON
+                    response.update(ok=False, error=str(error))
+                except Exception as error:                          # e.g. BrokenProcessPool, which must not drop the client
+                    response.update(ok=False, error=f'{type(error).__name__}: {error}')
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765, unix_path=None):
+        '''
+        Listens on a TCP port, or on a Unix socket if unix_path is given, until cancelled.
+        '''
+        if unix_path:
+            server = await asyncio.start_unix_server(self.serve_client, unix_path, limit=MAX_LINE)
+        else:
+            server = await asyncio.start_server(self.serve_client, host, port, limit=MAX_LINE)
+        print(f"Serving on {unix_path or f'{host}:{port}'}", file=sys.stderr, flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+
+
+async def _load_test_connection(open_connection, requests, latencies):
+    '''
+    Sends the requests one after another on one connection, appending the latency of each to latencies. Returns the number
+    of requests that failed, counting every request left unanswered if the server closes the connection.
+    '''
+    reader, writer = await open_connection()
+    errors = 0
+    try:
+        for sent, request in enumerate(requests):
+            start = time.perf_counter()
+            try:
+                writer.write(request)
+                await writer.drain()
+                response = await reader.readline()
+            except ConnectionError:
+                response = b''
+            if not response:                                        # the server closed the connection
+                errors += len(requests) - sent
+                break
+            latencies.append(time.perf_counter() - start)
+            try:
+                response = json.loads(response)
+            except ValueError:
+                response = None
+            if not isinstance(response, dict) or not response.get('ok'):
+                errors += 1
+    finally:
+        writer.close()
+    return errors
+
+
+async def load_test(host='127.0.0.1', port=8765, unix_path=None, connections=16, requests=1000, op='crack',
+                    method='words', size=280, word_file='words.txt', seed=2024):
+    '''
+    Measures the latency and throughput of a running server by sending requests over many connections at once. Each request
+    is a random message of about size characters made of dictionary words, encrypted with a random shift.
+
+    Inputs:
+        - host, port, unix_path: where the server is listening (unix_path takes precedence)
+        - connections (int): number of connections sending requests at the same time
+        - requests (int): total number of requests, shared between the connections
+        - op (string): 'encrypt', 'decrypt' or 'crack'
+        - method (string): cracking method, 'words', 'frequency' or 'adaptive'
+        - size (int): length of each message in characters
+        - word_file (string): word file used to generate the messages
+        - seed (int): seed for generating the messages
+    Output:
+        - (dict): the number of requests and errors, the total seconds, requests_per_s, and p50/p99/max latency in ms
+    '''
+    rng = random.Random(seed)
+    words = sorted(cc.load_words(word_file))
+    lines = []
+    for _ in range(requests):
+        text = ''
+        while len(text) < size:
+            text += rng.choice(words) + rng.choice([' ', ' ', ', ', '. '])
+        shift = rng.randrange(1, 26)
+        request = {'op': op, 'text': cc.shift_text(text[:size], shift), 'shift': shift, 'method': method}
+        lines.append(json.dumps(request).encode() + b'\n')
+
+    if unix_path:
+        open_connection = lambda: asyncio.open_unix_connection(unix_path, limit=MAX_LINE)
+    else:
+        open_connection = lambda: asyncio.open_connection(host, port, limit=MAX_LINE)
+    latencies = []
+    start = time.perf_counter()
+    errors = await asyncio.gather(*[_load_test_connection(open_connection, lines[n::connections], latencies)
+                                    for n in range(connections)])
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    percentile = lambda fraction: latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+    return {'requests': len(latencies), 'errors': sum(errors), 'seconds': seconds,
+            'requests_per_s': len(latencies) / seconds, 'p50_ms': statistics.median(latencies) * 1000,
+            'p99_ms': percentile(0.99), 'max_ms': latencies[-1] * 1000}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Caesar cipher server and load-test client.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help='run the server')
+    load_parser = commands.add_parser('loadtest', help='measure the latency and throughput of a running server')
+    for command_parser in (serve_parser, load_parser):
+        command_parser.add_argument('--host', default='127.0.0.1')
+        command_parser.add_argument('--port', type=int, default=8765)
+        command_parser.add_argument('--unix', help='path of a Unix socket to use instead of TCP')
+        command_parser.add_argument('-w', '--words', default=os.path.join(HERE, 'words.txt'), help='word file')
+    serve_parser.add_argument('--workers', type=int, help='worker processes for cracking (default: number of CPUs, '
+                                                          '0 to crack in threads)')
+    load_parser.add_argument('--connections', type=int, default=16)
+    load_parser.add_argument('--requests', type=int, default=1000)
+    load_parser.add_argument('--op', choices=['encrypt', 'decrypt', 'crack'], default='crack')
+    load_parser.add_argument('--method', choices=['words', 'frequency', 'adaptive'], default='words')
+    load_parser.add_argument('--size', type=int, default=280, help='characters per message (default: 280)')
+    load_parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(CipherServer(args.words, args.workers).serve(args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    results = asyncio.run(load_test(args.host, args.port, args.unix, args.connections, args.requests, args.op,
+                                    args.method, args.size, args.words))
+    if args.json:
+        print(json.dumps(results))
+    else:
+        print(f"{results['requests']} requests ({results['errors']} errors) in {results['seconds']:.2f} s: "
+              f"{results['requests_per_s']:.0f} requests/s, p50 {results['p50_ms']:.2f} ms, "
+              f"p99 {results['p99_ms']:.2f} ms, max {results['max_ms']:.2f} ms")
+    return 1 if results['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())